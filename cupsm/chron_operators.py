@@ -9,23 +9,48 @@ The code of this module deals with the time axes of the simulation data and the
 
 """
 # Further helper functions (excluded from ReadTheDocs documentation)
+#    - function "_target_months"
+#    - function "_annual_means"
+#    - function "_sim_id"
+#    - function "_keeps_resampled"
+#    - function "_resampled"
 #    - function "_sampfunc_slice2point"
 #    - function "_sampfunc_point2point"
 #    - function "_create_bounds_adjacent"
 #    - function "_create_bounds_distant"
+#    - function "_report_duplicates"
+#    - function "_count_duplicates"
+#    - function "_sim_matrix"
+#    - function "_nearest_index"
+#    - function "_compress"
+#    - function "_uncompress"
+#    - function "_interp_members"
+#    - function "_round_to_depth_axis"
+#    - function "_get_engine"
+#    - function "_point2point_loops"
+#    - function "_slice2point_loops"
+#    - function "_count_duplicates_loops"
+#    - function "_numba_kernel"
 
 # Imports
 from .utilities import *
+from .variable_operators import noise_ensemble
 import numpy as np
 import xarray as xr
 import pandas as pd
+import hashlib
+try:
+    import numba
+except ImportError:
+    numba = None
 
 # ~~~~~~~~~~~~~~~~~~~~~
 # Chron operator
 # ~~~~~~~~~~~~~~~~~~~~~
 def time2chron(sim_data2site, site_object,
                method="point2point", sampling=None, sampling_size=None,
-               quiet=False, return_resampled=False):
+               quiet=False, return_resampled=False, engine="numpy", rng=None, weighted=False, 
+               sim_id=None):
     """
     Resamples the simulation data in time according to the target requirements and the chronology data 
     (age ensemble) of the site object, using the provided mapping method. 
@@ -38,9 +63,13 @@ def time2chron(sim_data2site, site_object,
     
     --> Warning: The dimension of simulation data ensemble members must be named "ensemble_member" to ensure the functionality of the operator.
 
+    --> Instead of a noise ensemble DataArray, a virtual noise ensemble (cupsm.noise_ensemble, e.g. from cupsm.white_noise(..., virtual=True)) can be provided. Then only the simulation data ensemble members which are paired with age ensemble members are generated, resampled and mapped to their paired age ensemble members, one at a time, so only one simulation data ensemble member is held in memory. With return_resampled=True, these resampled ensemble members are kept and returned (annual or seasonal resolution).
+
+    --> If enabled, site objects keep the resampled simulation data (in memory if memoization is switched on, see lipd2object.memo_max_bytes, and on disk if the site object has an on-disk cache, see lipd2object.cache_dir), so repeated calls with the same simulation data and target (e.g. for different mapping methods) do not repeat the resampling. The simulation data is identified by sim_id or by a hash of its values, coordinates and attributes. The members of virtual noise ensembles are not kept.
+
     Parameters:
     -----------------------------
-    :sim_data2site: xarray DataArray of simulation data interpolated to the site location of interest (e.g. precomputed with cupsm.field2site()).
+    :sim_data2site: xarray DataArray of simulation data interpolated to the site location of interest (e.g. precomputed with cupsm.field2site()), or cupsm.noise_ensemble of such data.
     
     :site_object: Site object of interest (python class object created from lipd file of interest by applying cupsm.get_records_df(), see cupsm.get_records_df() documentation for more details). A target must have been initialized before by calling the method site_object.create_target().
                         
@@ -64,6 +93,20 @@ def time2chron(sim_data2site, site_object,
 
     :return_resampled: boolean; if True, the simulation data is returned after resampling in time according to the target object attributes as xarray DataArray. Default is False.
 
+    :engine: string; computational engine of the time mapping. Available keywords are:
+
+                            - "numpy": vectorized numpy code.
+                            - "numba": compiled loops (requires numba). The loops are compiled on the first call in each python process; the compiled code is cached on disk if the installation directory (or the numba cache directory) is writable.
+                            - "auto": "numba" if numba is installed, "numpy" otherwise.
+
+                        Default is "numpy".
+
+    :rng: None, integer or numpy.random.SeedSequence; seed of the random pairing of simulation data ensemble members and age ensemble members. The pairing uses the random stream of the site (see cupsm.site_seed()), so runs over several sites give the same results in any order or in parallel. Default is None (the global numpy random state is used, e.g. as set by numpy.random.seed()).
+
+    :weighted: boolean; if True, the monthly simulation data is weighted by the length of the months (in the calendar of the simulation data) when resampled to annual or seasonal means (see cupsm.resample_sim_data()). Default is False.
+
+    :sim_id: string; identifier of the simulation data (e.g. model, run and variable) for the resampled simulation data kept by the site object, must be unique for each simulation data. Not used for virtual noise ensembles. Saves the hashing of large simulation data. Default is None (a hash of the simulation data is used).
+
     """
     ## Prior checks:
     # Checks:
@@ -75,6 +118,7 @@ def time2chron(sim_data2site, site_object,
         if sampling == "distant" and sampling_size is None:
             print("A default sampling size of 10 millimeter is used.")
             sampling_size = 10
+    engine = _get_engine(engine)
     # check whether target was created
     if not hasattr(site_object, "target"):
         raise AttributeError("The target must be initialized in the site_object before the operators are applied.")
@@ -83,15 +127,21 @@ def time2chron(sim_data2site, site_object,
     sim_data = sim_data2site
     varname = sim_data.name # name of the sim_data variable
     
-    # resample simulation data given the target's requirements
-    if 'ensemble_member' in sim_data.coords and sim_data.ensemble_member.ndim!=0: 
-        a=[]
-        for i in sim_data.ensemble_member.values:
-            a.append(resample_sim_data(sim_data.sel(ensemble_member=i), site_object))
-        sim_data = xr.concat(a,dim="ensemble_member")
+    # resample simulation data given the target's requirements (or take the resampled data kept by the site object)
+    virtual = isinstance(sim_data, noise_ensemble)
+    if not virtual and _keeps_resampled(site_object):
+        sim_id = _sim_id(sim_data, sim_id)
+    if virtual:
+        # virtual noise ensemble: the members are generated after pairing, the first member gives the year axis
+        sim_ensemble = sim_data
+        sim_data = resample_sim_data(sim_ensemble.member(0), site_object, weighted=weighted)
+        sim_noise=True
+    elif 'ensemble_member' in sim_data.coords and sim_data.ensemble_member.ndim!=0: 
+        # all ensemble members are resampled at once
+        sim_data = _resampled(sim_data, site_object, weighted, sim_id).transpose("ensemble_member", ...)
         sim_noise=True
     else:
-        sim_data = resample_sim_data(sim_data, site_object)
+        sim_data = _resampled(sim_data, site_object, weighted, sim_id)
         sim_noise=False
 
     ## Chronology data
@@ -100,30 +150,49 @@ def time2chron(sim_data2site, site_object,
     ## Time mapping
     # prepare iteration through ensemble axis
     n_depth, n_ens = chron_data.shape
-    forward_proxy = np.full(chron_data.shape, np.nan) 
-
-    #iterate through ensemble axis
-    for i,ens_chron in enumerate(chron_data.T):
-        ens_chron_d = ens_chron
-        ens_chron = ens_chron.rename({"depth":"year"}).assign_coords({"year": ens_chron.values})
-        # Avoid duplicates due to nans
-        ens_chron_red= ens_chron[np.isnan(ens_chron.values)==False] 
-        if sim_noise==True:
-            # choose sim noise ensemble member randomly
-            sim_data_rand=sim_data.sel(ensemble_member=np.random.choice(list(sim_data.ensemble_member.values)[1:]))
-        else: 
-            # if no multiple ensemble members, choose the same sim_data for each chron ens member 
-            sim_data_rand=sim_data
 
-        if method == "point2point":
-            forward_proxy = _sampfunc_point2point(i=i, forward_proxy=forward_proxy, ens_chron=ens_chron,
-                                                 ens_chron_red=ens_chron_red, sim_data_rand=sim_data_rand,quiet=quiet)
+    if sim_noise==True:
+        # choose sim noise ensemble member randomly for each chron ens member
+        # random stream of the pairing
+        choice = np.random.choice if rng is None else np.random.default_rng(site_seed(rng, site_object.site_name)).choice
+        if virtual:
+            sim_members = choice(list(sim_ensemble.ensemble_member)[1:], size=n_ens)
+        else:
+            sim_members = choice(list(sim_data.ensemble_member.values)[1:], size=n_ens)
+    else:
+        # if no multiple ensemble members, choose the same sim_data for each chron ens member 
+        sim_members = None
 
+    def mapping(chron, years, sim_values, rows, quiet):
+        if method == "point2point":
+            return _sampfunc_point2point(chron=chron, years=years, sim_values=sim_values, rows=rows, 
+                                         quiet=quiet, engine=engine)
         elif method == "slice2point":
-            forward_proxy = _sampfunc_slice2point(i=i, forward_proxy=forward_proxy, ens_chron=ens_chron,
-                                                 ens_chron_d = ens_chron_d,
-                                                 ens_chron_red=ens_chron_red, sim_data_rand=sim_data_rand,
-                                                 sampling=sampling, sampling_size=sampling_size,quiet=quiet)
+            return _sampfunc_slice2point(chron=chron, depth=chron_data.depth.values, years=years, 
+                                         sim_values=sim_values, rows=rows, sampling=sampling, 
+                                         sampling_size=sampling_size, engine=engine)
+
+    chron = chron_data.values.astype(float)
+    if virtual:
+        # generate, resample and map one paired simulation data ensemble member at a time (to the age ensemble 
+        # members paired with it), so only one member is held in memory
+        if method == "point2point" and not quiet:
+            _report_duplicates(chron, engine)
+        forward_proxy = np.full(chron.shape, np.nan)
+        resampled = []
+        for k in np.unique(sim_members):
+            cols = np.flatnonzero(sim_members == k)
+            member = resample_sim_data(sim_ensemble.member(k), site_object, weighted=weighted)
+            forward_proxy[:, cols] = mapping(chron[:, cols], member.year.values, member.values[np.newaxis, :], 
+                                             np.zeros(len(cols), dtype=int), quiet=True)
+            if return_resampled:
+                resampled.append(member)
+        if return_resampled:
+            sim_data = xr.concat(resampled, dim="ensemble_member")
+    else:
+        # raw numpy arrays for the mapping of all ensemble members at once
+        years, sim_values, rows = _sim_matrix(sim_data, sim_members, n_ens)
+        forward_proxy = mapping(chron, years, sim_values, rows, quiet)
 
     # create xr.DataArray for forward proxy object
     forward_proxy = xr.DataArray(data=forward_proxy, dims=chron_data.dims, 
@@ -143,26 +212,87 @@ def time2chron(sim_data2site, site_object,
 # ~~~~~~~~~~~~~~~~~~~~~~
 # Helper functions
 # ~~~~~~~~~~~~~~~~~~~~~~
-def resample_sim_data(sim_data, site_object):
+def resample_sim_data(sim_data, site_object, weighted=False):
     """
     Resamples the given simulation data based on the attributes of the target object.
     Subclass of the site_object. Returns result as a xarray DataArray. Helper function for cupsm.time2chron().
 
+    The time axis is decoded once into integer years and months, the annual or seasonal means (of the months of 
+    each calendar year) are then computed for all other dimensions (e.g. ensemble members) at once. Missing values 
+    are skipped, years without data are set to missing values. 
+
     Parameters:
     ------------------------------------
     :sim_data: xarray DataArray of simulation data interpolated to the site location of interest (e.g. precomputed with cupsm.field2site()).
                       
     :site_object: Site object of interest with subclass target initialized and available at site_object.target.
+
+    :weighted: boolean; if True, the months are weighted by their length in the calendar of the simulation data. Default is False.
     
     """
-    # sort time axis of the simulation data (that resampling works)
-    sim_data = sim_data.sortby("time")
+    # target months
+    month_i = _target_months(site_object)
+
+    # decode the time axis into integer years and months (no calendar adjustment, months of a calendar year)
+    time = sim_data["time"]
+    years = time.dt.year.values.astype(np.int64)
+    weights = time.dt.days_in_month.values.astype(float) if weighted else None
+    if month_i is not None:
+        select = np.isin(time.dt.month.values, month_i)
+        sim_data, years = sim_data.isel(time=select), years[select]
+        weights = weights[select] if weighted else None
+    year_axis = np.arange(years.min(), years.max() + 1)
+
+    # annual means along the (last) core dimension
+    dtype = sim_data.dtype if sim_data.dtype.kind == "f" else np.dtype(float)
+    resampled = xr.apply_ufunc(_annual_means, sim_data, input_core_dims=[["time"]], output_core_dims=[["year"]], 
+                               exclude_dims={"time"}, kwargs={"codes" : years - year_axis[0], "n_years" : len(year_axis), 
+                                                              "weights" : weights, "dtype" : dtype}, 
+                               dask="parallelized", output_dtypes=[dtype], keep_attrs=True,
+                               dask_gufunc_kwargs={"output_sizes" : {"year" : len(year_axis)}, "allow_rechunk" : True})
+    # year axis at the position of the time axis
+    dims = [("year" if dim == "time" else dim) for dim in sim_data.dims]
+    return resampled.assign_coords(year=year_axis).transpose(*dims)
 
+def provide_chron_data (site_object, sim_data, quiet):
+    """
+    Converts site object chronology data from kiloyears to years, rounds it to annual scale and cuts it according to the age limits of the provided simulation data. 
+    The result is returned as a xarray DataArray. Helper function for cupsm.time2chron().
+    
+    Parameters:
+    ------------------------------
+    :site_object: Site object of interest (python class object created from lipd file of interest by applying cupsm.get_records_df(), see cupsm.get_records_df() documentation for more details). 
+    :sim_data: xarray DataArray of simulation data interpolated to the site location of interest (e.g. precomputed with cupsm.field2site()) and resampled in time according to the target object attributes (as done by the helper function cupsm.resample_sim_data(), see documentation of cupsm.resample_sim_data for more details).
+    :quiet: boolean; print (False) or suppress (True) diagnostic output. Default is False.
+
+    """
+    def convert():
+        # load chron data
+        chron_data = site_object.load_chron_data()
+        # convert age data to ka (comparison beyond annual scale not reasonable)
+        return (chron_data * 1000).round().astype(int) 
+
+    def cut():
+        # cut the chron data to simulation years min and max
+        chron_data = memo(("provide_chron_data",), convert)
+        return chron_data.where((chron_data <= simy_max) & (chron_data >= simy_min), drop=True)
+
+    simy_min = sim_data.year.min().values
+    simy_max = sim_data.year.max().values
+    # site objects keep the results in memory if memoization is switched on (see lipd2object.memo), so repeated calls 
+    # (e.g. for several simulations) do not repeat the conversion
+    memo = getattr(site_object, "memo", lambda key, function: function())
+    return memo(("provide_chron_data", int(simy_min), int(simy_max)), cut)
+
+def _target_months(site_object):
+    """
+    Returns the target months of the site object (list of integers), or None for annual means. 
+    Helper function for cupsm.resample_sim_data().
+    """
     # define target and latitude value
     target = site_object.target
     lat_coord = site_object.coords[1]
 
-    # resampling
     if hasattr(target, "habitatSeason"):
         if target.habitatSeason not in ["annual", "unknown"]:
             # latitude decides over month, season is local
@@ -176,240 +306,593 @@ def resample_sim_data(sim_data, site_object):
                 month_i = {"JJA" : [6, 7, 8], "DJF" : [12, 1, 2] }[season]
             else:
                 month_i = target.month_i 
-            
-            # resampling, not weighted by length of month and no calendar adjustment
-            seasonal_data = sim_data.where(sim_data['time.month'].isin(month_i), drop=True)
-            resampled = seasonal_data.resample(time="1Y").mean("time")
-            # convert time axis to years as integers
-            resampled = resampled.groupby("time.year").mean("time")    
-        
         else:
-            resampled = sim_data.resample(time="1Y").mean("time")
-            resampled = resampled.groupby("time.year").mean("time")
+            month_i = None
     else:
         raise AttributeError("The target habitat season is not defined. Check the source code in site_object.py.")
-    return resampled
+    return month_i
 
-def provide_chron_data (site_object, sim_data, quiet):
+def _annual_means(values, codes, n_years, weights, dtype):
     """
-    Converts site object chronology data from kiloyears to years, rounds it to annual scale and cuts it according to the age limits of the provided simulation data. 
-    The result is returned as a xarray DataArray. Helper function for cupsm.time2chron().
-    
-    Parameters:
-    ------------------------------
-    :site_object: Site object of interest (python class object created from lipd file of interest by applying cupsm.get_records_df(), see cupsm.get_records_df() documentation for more details). 
-    :sim_data: xarray DataArray of simulation data interpolated to the site location of interest (e.g. precomputed with cupsm.field2site()) and resampled in time according to the target object attributes (as done by the helper function cupsm.resample_sim_data(), see documentation of cupsm.resample_sim_data for more details).
-    :quiet: boolean; print (False) or suppress (True) diagnostic output. Default is False.
+    Returns the (weighted) means of values over the last axis within the groups given by the integer codes 
+    (0, ..., n_years - 1), as a numpy.ndarray with the last axis of length n_years. Missing values are skipped, 
+    groups without values are set to NaN. Helper function for cupsm.resample_sim_data().
+    """
+    # order the time steps by year (already ordered for sorted time axes)
+    if np.any(codes[1:] < codes[:-1]):
+        order = np.argsort(codes, kind="stable")
+        values, codes = values[..., order], codes[order]
+        weights = None if weights is None else weights[order]
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    weights = np.ones(len(codes)) if weights is None else weights
+
+    valid = ~np.isnan(values)
+    if valid.all():
+        # no missing values: normalization is equal for all grid points and ensemble members
+        sums = np.add.reduceat(values * weights, starts, axis=-1)
+        norms = np.add.reduceat(weights, starts)
+    else:
+        sums = np.add.reduceat(np.where(valid, values * weights, 0), starts, axis=-1)
+        norms = np.add.reduceat(valid * weights, starts, axis=-1)
+
+    out = np.full(values.shape[:-1] + (n_years,), np.nan, dtype=dtype)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out[..., codes[starts]] = sums / norms
+    return out
 
+def _sim_id(sim_data, sim_id=None):
     """
-    # load chron data
-    chron_data = site_object.load_chron_data()
-    # convert age data to ka (comparison beyond annual scale not reasonable)
-    chron_data = (chron_data * 1000).round().astype(int) 
-    # cut the chron data to simulation years min and max
-    simy_min = sim_data.year.min().values
-    simy_max = sim_data.year.max().values
-    chron_data = chron_data.where((chron_data <= simy_max) & (chron_data >= simy_min), drop=True)
-    return chron_data
+    Returns the identifier of the simulation data (xarray DataArray): sim_id or a hash of the values, coordinates, name 
+    and attributes (for dask arrays, the dask name is used instead of the values). Helper function for cupsm.time2chron().
+    """
+    def update(h, array):
+        array = np.asarray(array)
+        h.update(f"{array.dtype}{array.shape}".encode())
+        if array.dtype.hasobject:
+            h.update(str(array.tolist()).encode())
+        else:
+            h.update(np.ascontiguousarray(array).view(np.uint8))
+
+    h = hashlib.sha256()
+    if sim_id is not None:
+        h.update(str(sim_id).encode())
+    else:
+        data = sim_data
+        h.update(f"{data.name}{data.dims}{sorted(data.attrs.items())}".encode())
+        if data.chunks is not None:
+            h.update(data.data.name.encode())
+        else:
+            update(h, data.values)
+        for name in sorted(data.coords):
+            if name == "time":
+                # the resampling only depends on the years and months
+                update(h, data["time"].dt.year.values)
+                update(h, data["time"].dt.month.values)
+                update(h, data["time"].dt.days_in_month.values)
+            else:
+                h.update(f"{name}{data[name].dims}".encode())
+                update(h, data[name].values)
+    return h.hexdigest()
 
-def _sampfunc_slice2point(i, forward_proxy, ens_chron, ens_chron_d,
-                         ens_chron_red, sim_data_rand,
-                         sampling, sampling_size, quiet):
+def _keeps_resampled(site_object):
+    """
+    Returns True if the site object keeps resampled simulation data, i.e. if its memoization is enabled 
+    (lipd2object.memo_max_bytes != 0) or it has an on-disk cache (lipd2object.cache_dir). Helper function for 
+    cupsm.time2chron().
     """
-    Performs year to slice sampling between a member of the age ensemble and the simulation data. Returns results as entries
-    of a numpy.ndarray of the shape of the chronology data. Helper function for cupsm.time2chron().
+    if not hasattr(site_object, "memo"):
+        return False
+    return getattr(site_object, "memo_max_bytes", 0) != 0 or getattr(site_object, "cache_dir", None) is not None
+
+def _resampled(sim_data, site_object, weighted, sim_id):
+    """
+    Returns the simulation data resampled by cupsm.resample_sim_data(). The results are kept by the site object in memory 
+    (see lipd2object.memo) and in its on-disk cache (if the site object has one), with the key (simulation data 
+    identifier, variable, target months, weighting). Helper function for cupsm.time2chron().
+    """
+    def resample():
+        return resample_sim_data(sim_data, site_object, weighted=weighted)
+
+    if not _keeps_resampled(site_object):
+        # nothing is kept: the resampled data stays lazy for dask-backed simulation data
+        return resample()
+    month_i = _target_months(site_object)
+    key = ("resample_sim_data", sim_id, sim_data.name, None if month_i is None else tuple(int(m) for m in month_i), 
+           bool(weighted))
+
+    def load():
+        cache_dir = getattr(site_object, "cache_dir", None)
+        if cache_dir is None:
+            return resample().compute()
+        from .utilities_lipd import _cache_load, _cache_save
+        # the on-disk cache of the record (content-addressed, see lipd2object.cache_dir)
+        part = "resampled_" + hashlib.sha256(repr(key).encode()).hexdigest()[:32]
+        cached = _cache_load(cache_dir, site_object._cache_key(), part)
+        if cached is not None:
+            arrays, meta = cached
+            coords = {name: (dims, arrays[name]) for name, dims in meta["coords"].items()}
+            return xr.DataArray(arrays["values"], dims=meta["dims"], coords=coords, name=meta["name"], attrs=meta["attrs"])
+        resampled = resample().compute()
+        arrays = {"values": resampled.values}
+        arrays.update({name: resampled[name].values for name in resampled.coords})
+        _cache_save(cache_dir, site_object._cache_key(), part, arrays, 
+                    {"dims": resampled.dims, "name": resampled.name, "attrs": resampled.attrs, 
+                     "coords": {name: resampled[name].dims for name in resampled.coords}})
+        return resampled
+
+    return site_object.memo(key, load)
+
+def _sampfunc_slice2point(chron, depth, years, sim_values, rows, sampling, sampling_size, engine):
+    """
+    Performs year to slice sampling between all members of the age ensemble and the simulation data. Returns results 
+    as a numpy.ndarray of the shape of the chronology data. Helper function for cupsm.time2chron().
+
+    With the numpy engine, the slice means are computed from the cumulative sum of the simulation data, so each slice mean 
+    is given by two lookups and a division for the whole (depth x ens) matrices of slice bounds at once. With the numba engine,
+    the slices are summed up in compiled loops. If an age ensemble member has less than two data points (the bounds are nan), 
+    the nearest simulation year is taken instead (point2point mapping).
 
     Parameters:
     ----------
-    i              : integer; index of age ensemble member of interest
-    forward_proxy  : numpy.ndarray in the shape of the chronology data that was loaded via cupsm.provide_chron_data(); see documentation of 
-                       cupsm.provide_chron_data() for more details.
-    ens_chron      : xarray Dataarray; age ensemble member of interest after transforming depth to year axis
-                       #ens_chron = ens_chron.rename({"depth":"year"}).assign_coords({"year":  ens_chron.values})            
-    ens_chron_d    : xarray Dataarray; age ensemble member of interest 
-    ens_chron_red  : xarray Dataaray; obtained by removing NaN values from "ens_chron"
-    sim_data_rand  : xarray Dataarray; ensemble member of interest of simulation data interpolated to the site location of interest
-                      (e.g. precomputed with cupsm.field2site()) and resampled in time according to the target object attributes 
-                      (as done by the helper function cupsm.resample_sim_data(), see documentation of cupsm.resample_sim_data for more details). 
-                        
+    chron          : numpy.ndarray (depth x ens) of chronology data in years, as loaded via cupsm.provide_chron_data(); see 
+                       documentation of cupsm.provide_chron_data() for more details.
+    depth          : numpy.ndarray; depth axis of the chronology data in meter
+    years          : numpy.ndarray; year axis of the simulation data
+    sim_values     : numpy.ndarray (sim ensemble member x year) of the simulation data interpolated to the site location of 
+                       interest and resampled in time according to the target object attributes (see cupsm._sim_matrix()).
+    rows           : numpy.ndarray; row of sim_values paired with each age ensemble member
     sampling       : string; sampling method. Available keywords: "adjacent" (whole core was sampled)
                        and "distant" (samples of a certain sampling size with a certain sampling distance).
-
     sampling_size  : integer; length of the sample in the depth axis in millimeter, only used if sampling method is "distant". 
-
-    quiet          : boolean; print (False) or suppress (True) diagnostic output. Default is False.
+    engine         : string; "numba" or "numpy"
     """
-    
-    ## Create bounds
+    ## Create bounds (depth x ens)
     if sampling == "adjacent":
-        lower_bounds, upper_bounds = _create_bounds_adjacent(ens_chron=ens_chron,
-                                                            ens_chron_red=ens_chron_red, 
-                                                            sim_data_rand=sim_data_rand, 
-                                                            quiet=quiet)
+        lower_bounds, upper_bounds = _create_bounds_adjacent(chron=chron, years=years)
     elif sampling == "distant":
-        lower_bounds, upper_bounds = _create_bounds_distant(ens_chron=ens_chron,
-                                                           ens_chron_d = ens_chron_d,
-                                                           ens_chron_red=ens_chron_red, 
-                                                           sim_data_rand=sim_data_rand,
-                                                           sampling_size = sampling_size,
-                                                           quiet=quiet)
-    # unfortunately elementwise (iterate through elements of ens member (actually their bounds))
-    # iteration through .notnull() to jump over np.nans, but keep index j correctly running
-    for j, notnull in enumerate(ens_chron.notnull()):
-        if notnull == False: 
-            continue
-        # bounds
-        lower = lower_bounds[j]
-        upper = upper_bounds[j]
-        # if there is only one data point the bounds are nan, do a point2point mapping
-        if np.isnan(lower) or np.isnan(upper):
-            # write data in
-            forward_proxy[j,i] = sim_data_rand.sel(year=ens_chron[j], method="nearest")
-        else:
-            # mask and mean
-            mean = sim_data_rand.sel(year=slice(lower, upper)).mean()
-            # write data in
-            forward_proxy[j,i] = mean
+        lower_bounds, upper_bounds = _create_bounds_distant(chron=chron, depth=depth, years=years, 
+                                                            sampling_size=sampling_size)
+
+    if engine == "numba":
+        forward_proxy = np.full(chron.shape, np.nan)
+        _slice2point_numba(chron, lower_bounds, upper_bounds, years, sim_values, rows, forward_proxy)
+        return forward_proxy
+
+    notnull = np.isnan(chron)==False
+    # if there is only one data point the bounds are nan, do a point2point mapping
+    is_slice = notnull & (np.isnan(lower_bounds)==False) & (np.isnan(upper_bounds)==False)
+    is_point = notnull & (is_slice==False)
+    cols = np.broadcast_to(rows[np.newaxis, :], chron.shape)
+
+    forward_proxy = np.full(chron.shape, np.nan)
+    
+    # slice means from prefix sums; offset by the mean of each simulation member to limit round-off errors
+    sim_valid = np.isnan(sim_values)==False
+    sim_filled = np.where(sim_valid, sim_values, 0.)
+    offset = sim_filled.sum(axis=1, keepdims=True) / np.maximum(sim_valid.sum(axis=1, keepdims=True), 1)
+    cum_sum = np.zeros((sim_values.shape[0], len(years)+1))
+    cum_sum[:, 1:] = np.cumsum(np.where(sim_valid, sim_filled - offset, 0.), axis=1)
+    cum_count = np.zeros((sim_values.shape[0], len(years)+1), dtype=int)
+    cum_count[:, 1:] = np.cumsum(sim_valid, axis=1)
+
+    # slice [lower, upper] (inclusive) on the simulation year axis
+    ind_lower = np.searchsorted(years, lower_bounds[is_slice], side="left")
+    ind_upper = np.maximum(np.searchsorted(years, upper_bounds[is_slice], side="right"), ind_lower)
+    r = cols[is_slice]
+    count = cum_count[r, ind_upper] - cum_count[r, ind_lower]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = (cum_sum[r, ind_upper] - cum_sum[r, ind_lower]) / count + offset[r, 0]
+    forward_proxy[is_slice] = np.where(count > 0, means, np.nan)
+
+    # nearest simulation year
+    forward_proxy[is_point] = sim_values[cols[is_point], _nearest_index(years, chron[is_point])]
         
     return forward_proxy 
 
-def _sampfunc_point2point(i, forward_proxy, ens_chron,
-                         ens_chron_red, sim_data_rand, quiet):
+def _sampfunc_point2point(chron, years, sim_values, rows, quiet, engine):
     """
-    Performs year to year sampling between a member of the age ensemble and the simulation data. Returns results as entries
-    of a xarray Dataarray of the shape of the chronology data. Helper function for cupsm.time2chron().
+    Performs year to year sampling between all members of the age ensemble and the simulation data at once. Returns results 
+    as a numpy.ndarray of the shape of the chronology data. Helper function for cupsm.time2chron().
 
+    With the numpy engine, the years of the whole (depth x ens) chronology matrix are located on the year axis of the simulation 
+    data with a single numpy.searchsorted call, and the simulation data is gathered by fancy indexing. With the numba engine, the
+    same is done in compiled loops. Depths whose age is nan or not covered by the simulation data remain nan. Duplicate years in 
+    the age model are mapped to the same simulation year.
     
     Parameters:
     ----------
-    i              : integer; index of age ensemble member of interest
-    forward_proxy  : numpy.ndarray in the shape of the chronology data that was loaded via cupsm.provide_chron_data(); see documentation of 
-                       cupsm.provide_chron_data() for more details.
-    ens_chron      : xarray Dataarray; age ensemble member of interest after transforming depth to year axis            
-    ens_chron_red  : xarray Dataaray; obtained by removing NaN values from "ens_chron"
-    sim_data_rand  : xarray Dataarray; ensemble member of interest of simulation data interpolated to the site location of interest
-                      (e.g. precomputed with cupsm.field2site()) and resampled in time according to the target object attributes 
-                      (as done by the helper function cupsm.resample_sim_data(), see documentation of cupsm.resample_sim_data for more details).
+    chron          : numpy.ndarray (depth x ens) of chronology data in years, as loaded via cupsm.provide_chron_data(); see 
+                       documentation of cupsm.provide_chron_data() for more details.
+    years          : numpy.ndarray; year axis of the simulation data
+    sim_values     : numpy.ndarray (sim ensemble member x year) of the simulation data interpolated to the site location of 
+                       interest and resampled in time according to the target object attributes (see cupsm._sim_matrix()).
+    rows           : numpy.ndarray; row of sim_values paired with each age ensemble member
     quiet          : boolean; if True prints out information about potential year duplicates in the age model. Default is False.
+    engine         : string; "numba" or "numpy"
     """
-    varname = sim_data_rand.name
-    try:
-        forward_proxy[:,i][ens_chron.notnull()]=xr.merge([ens_chron_red,sim_data_rand],join="left")[varname].values # merge excluding nans
-    except ValueError:
-        # this happens due to year duplicates in the age model
-        if not quiet:
-            print(f"For chron ensemble member {i+1}, the age column contains duplicates.")
-        ens_chron_unique=ens_chron_red.drop_duplicates(dim="year",keep=False) # drop all duplicates
-        duplicates=set(list(ens_chron_red.year.values)).difference(list(ens_chron_unique.year.values)) # years for which we have duplicates
-        if not quiet:
-            print("Years with duplicates:"+str(len(duplicates)))
-        ens_chron_copy=np.copy(ens_chron) # simple copy of values 
-        for d in duplicates:
-            sim_ind=np.where((sim_data_rand.year==d)==True)
-            forward_proxy[np.where(ens_chron==d),i]=sim_data_rand[sim_ind].values 
-            ens_chron_copy[np.where(ens_chron==d)]=np.nan # set duplicates to nans in ens_chron_copy
-        forward_proxy[:,i][np.isnan(ens_chron_copy)==False]=xr.merge([ens_chron_unique,sim_data_rand],join="left")[varname].values # merge exclud. duplicates
+    # report year duplicates in the age model
+    if not quiet:
+        _report_duplicates(chron, engine)
+
+    if engine == "numba":
+        forward_proxy = np.full(chron.shape, np.nan)
+        _point2point_numba(chron, years, sim_values, rows, forward_proxy)
+        return forward_proxy
+
+    # position of the chron years on the simulation year axis
+    notnull = np.isnan(chron)==False
+    pos = np.clip(np.searchsorted(years, np.where(notnull, chron, years[0])), 0, len(years)-1)
+    found = notnull & (years[pos] == chron)
+
+    # gather
+    forward_proxy = np.where(found, sim_values[rows[np.newaxis, :], pos], np.nan)
     return forward_proxy
 
-def _create_bounds_adjacent(ens_chron, ens_chron_red, sim_data_rand, quiet):
+def _create_bounds_adjacent(chron, years):
     """
     Determines the upper and lower bounds of the time slices for the simulation data over which will be averaged. Assumes adjacent slices.
-    Helper function for cupsm._sampfunc_slice2point().
-    """
-    # check if there are too little data points
-    if ens_chron_red.shape[0] < 2:
-        lower_bounds_with_nan = np.full(ens_chron.shape, np.nan) 
-        upper_bounds_with_nan = lower_bounds_with_nan.copy()
+    The bounds of all age ensemble members are computed at once and returned as two numpy.ndarrays of the shape of the chronology data 
+    (nan where the chronology is nan, or for members with less than two data points). Helper function for cupsm._sampfunc_slice2point().
 
-        # return only nan
-        return lower_bounds_with_nan, upper_bounds_with_nan
-    
-    # create 2 empty arrays
-    lower_bounds = np.full(ens_chron_red.shape, 0) 
+    Parameters:
+    ----------
+    chron          : numpy.ndarray (depth x ens) of chronology data in years
+    years          : numpy.ndarray; year axis of the simulation data
+    """
+    # per member: non-nan values first (in depth order), followed by nans
+    chron_red, order, n_valid = _compress(chron)
+    lower_bounds = np.full(chron.shape, np.nan)
     upper_bounds = lower_bounds.copy()
     
-    #write values in
-    lower_bounds[1:] = ens_chron_red.values[1:] - ens_chron_red.diff(dim="year").values/2
-    lower_bounds[0] = ens_chron_red.values[0] - ens_chron_red.diff(dim="year").values[0]/2
+    # check if there are too little data points
+    members = np.flatnonzero(n_valid >= 2)
+    if len(members) == 0:
+        # return only nan
+        return lower_bounds, upper_bounds
+    last = n_valid[members] - 1
+
+    # write values in (truncated to integer years)
+    diff = np.diff(chron_red, axis=0)
+    lower_bounds[1:] = np.trunc(chron_red[1:] - diff/2)
+    lower_bounds[0] = np.trunc(chron_red[0] - diff[0]/2)
     
     upper_bounds[:-1] = lower_bounds[1:]
-    upper_bounds[-1] = ens_chron_red.values[-1] + ens_chron_red.diff(dim="year").values[-1]/2
-    
-    
+    upper_bounds[last, members] = np.trunc(chron_red[last, members] + diff[last-1, members]/2)
+
+    # mask entries beyond the data points and members with too little data points
+    valid = (np.arange(chron.shape[0])[:, np.newaxis] < n_valid) & (n_valid >= 2)
+    lower_bounds[valid==False] = np.nan
+    upper_bounds[valid==False] = np.nan
+
     # check bounds with sim data
-    if upper_bounds.max() > sim_data_rand.year.max():
-        #if not quiet:
-            #print("""Simulation data does not cover planned slices 
-            #--> upper bounds are cut to simulation data availability""")
-        upper_bounds[-1] = sim_data_rand[-1].year.values
-    
-    if lower_bounds.min() < sim_data_rand.year.min():
-        #if not quiet: 
-            #print("""Simulation data does not cover planned slices 
-            #--> lower bounds are cut to simulation data availability""")
-        lower_bounds[0] = sim_data_rand[0].year.values
+    # --> upper bounds are cut to simulation data availability
+    too_late = np.nanmax(np.where(valid, upper_bounds, -np.inf), axis=0)[members] > years.max()
+    upper_bounds[last[too_late], members[too_late]] = years[-1]
+    # --> lower bounds are cut to simulation data availability
+    too_early = np.nanmin(np.where(valid, lower_bounds, np.inf), axis=0)[members] < years.min()
+    lower_bounds[0, members[too_early]] = years[0]
 
     # bring back into original (nan containing shape)
-    lower_bounds_with_nan = np.full(ens_chron.shape, np.nan) 
-    upper_bounds_with_nan = lower_bounds_with_nan.copy()
-
-    # put in data
-    lower_bounds_with_nan[ens_chron.notnull()] = lower_bounds
-    upper_bounds_with_nan[ens_chron.notnull()] = upper_bounds
-    
-    return lower_bounds_with_nan, upper_bounds_with_nan
+    return _uncompress(lower_bounds, order), _uncompress(upper_bounds, order)
 
-def _create_bounds_distant(ens_chron, ens_chron_d, ens_chron_red, sim_data_rand, sampling_size, quiet):
+def _create_bounds_distant(chron, depth, years, sampling_size):
     """
     Determines the upper and lower bounds of the time slices for the simulation data over which will be averaged. Assumes distant slices.
-    Helper function for cupsm._sampfunc_slice2point().
-    """
-    # mask nans out, but still in depth space:
-    depth_red = ens_chron_d.depth[ens_chron.notnull().values]
-
-    # interpolate to finer depth axis
-    step=0.001 #resolution in m
-    depth_interp = np.arange(depth_red[0]-10*step, depth_red[-1]+10*step,step=step) #target depth axis
-    ages_interp = np.round(np.interp(depth_interp, depth_red, ens_chron_red)).astype(int) #interpolated ages
-
-    # create DataArrays:
-    depth_interp = xr.DataArray(data=depth_interp, dims=depth_red.dims, coords={"depth":depth_interp}, name="depth")
-    ages_interp = xr.DataArray(data=ages_interp, dims="year", coords={"year":ages_interp}, name="ageEnsemble")
+    The bounds of all age ensemble members are computed at once and returned as two numpy.ndarrays of the shape of the chronology data 
+    (nan where the chronology is nan). The ages are interpolated directly at the bound depths, which are rounded to a resolution 
+    of 1 mm. Helper function for cupsm._sampfunc_slice2point().
 
-    # bounds in depth space (unit: meter)
-    lower_bounds = depth_red - sampling_size * 0.001 * 0.5 #half the sampling size, from mm to m
-    upper_bounds = depth_red + sampling_size * 0.001 * 0.5 #half the sampling size, from mm to m
-    
-    # find appropriate ages
-    # depth_interp.isin(depth_interp.sel(depth=upper_bounds, method="nearest")).values :
-    # creates a mask of True and False where elements are equal, then ages are indexed
-    lower_bounds = ages_interp[depth_interp.isin(depth_interp.sel(depth=lower_bounds, method="nearest")).values]
-    upper_bounds = ages_interp[depth_interp.isin(depth_interp.sel(depth=upper_bounds, method="nearest")).values]
+    Parameters:
+    ----------
+    chron          : numpy.ndarray (depth x ens) of chronology data in years
+    depth          : numpy.ndarray; depth axis of the chronology data in meter
+    years          : numpy.ndarray; year axis of the simulation data
+    sampling_size  : integer; length of the sample in the depth axis in millimeter
+    """
+    step = 0.001 # resolution in m
+    notnull = np.isnan(chron)==False
+    members = np.flatnonzero(notnull.any(axis=0))
+    first = np.argmax(notnull, axis=0)[members] # first data point of each member
+    last = chron.shape[0] - 1 - np.argmax(notnull[::-1], axis=0)[members] # last data point of each member
+
+    # bounds in depth space (unit: meter), half the sampling size, from mm to m
+    depth_lower = depth - sampling_size * 0.001 * 0.5
+    depth_upper = depth + sampling_size * 0.001 * 0.5
     
+    # round to the 1 mm depth axis of each member, which starts 10 mm above its first data point
+    # and ends 10 mm below its last data point
+    start = np.full(chron.shape[1], np.nan)
+    stop = start.copy()
+    start[members] = depth[first] - 10*step
+    stop[members] = depth[last] + 10*step
+    depth_lower = _round_to_depth_axis(depth_lower[:, np.newaxis], start, stop, step)
+    depth_upper = _round_to_depth_axis(depth_upper[:, np.newaxis], start, stop, step)
+
+    # find appropriate ages by linear interpolation in depth (all members at once)
+    lower_bounds, upper_bounds = np.where(notnull, np.round(_interp_members(np.stack([depth_lower, depth_upper]), depth, 
+                                                                            chron, notnull)), np.nan)
+
     # correct first lower value and last upper value (is due to interpolation the covered age range)
     # by symmetric mirroring of distance
-    lower_bounds[0] = lower_bounds[0] - (upper_bounds[0] - lower_bounds[0])
-    upper_bounds[-1] = upper_bounds[-1] + (upper_bounds[-1] - lower_bounds[-1])
+    lower_bounds[first, members] = lower_bounds[first, members] - (upper_bounds[first, members] - lower_bounds[first, members])
+    upper_bounds[last, members] = upper_bounds[last, members] + (upper_bounds[last, members] - lower_bounds[last, members])
 
     # check bounds with sim data
-    if upper_bounds.max() > sim_data_rand.year.max():
-        #if not quiet:
-            #print("""Simulation data does not cover planned slices 
-            #--> upper bounds are cut to simulation data availability""")
-        upper_bounds[-1] = sim_data_rand[-1].year.values
+    # --> upper bounds are cut to simulation data availability
+    too_late = np.nanmax(np.where(notnull, upper_bounds, -np.inf), axis=0)[members] > years.max()
+    upper_bounds[last[too_late], members[too_late]] = years[-1]
+    # --> lower bounds are cut to simulation data availability
+    too_early = np.nanmin(np.where(notnull, lower_bounds, np.inf), axis=0)[members] < years.min()
+    lower_bounds[first[too_early], members[too_early]] = years[0]
     
-    if lower_bounds.min() < sim_data_rand.year.min():
-        #if not quiet: 
-            #print("""Simulation data does not cover planned slices 
-            #--> lower bounds are cut to simulation data availability""")
-        lower_bounds[0] = sim_data_rand[0].year.values
+    return lower_bounds, upper_bounds
 
-    # bring back into original (nan containing shape)
-    lower_bounds_with_nan = np.full(ens_chron.shape, np.nan) 
-    upper_bounds_with_nan = lower_bounds_with_nan.copy()
+def _report_duplicates(chron, engine):
+    """
+    Prints the number of year duplicates of each age ensemble member which contains duplicates. 
+    Helper function for cupsm.time2chron().
 
-    # put in data
-    lower_bounds_with_nan[ens_chron.notnull()] = lower_bounds
-    upper_bounds_with_nan[ens_chron.notnull()] = upper_bounds
-    
-    return lower_bounds_with_nan, upper_bounds_with_nan
+    Parameters:
+    ----------
+    chron          : numpy.ndarray (depth x ens) of chronology data in years
+    engine         : string; "numba" or "numpy"
+    """
+    if engine == "numba":
+        n_duplicates = np.zeros(chron.shape[1], dtype=int)
+        _count_duplicates_numba(chron, n_duplicates)
+    else:
+        n_duplicates = _count_duplicates(chron)
+    for i in np.flatnonzero(n_duplicates):
+        print(f"For chron ensemble member {i+1}, the age column contains duplicates.")
+        print("Years with duplicates:"+str(n_duplicates[i]))
+
+def _count_duplicates(chron):
+    """
+    Returns the number of years which occur more than once in each member (column) of the chronology matrix (nans excluded).
+    Helper function for cupsm._sampfunc_point2point().
+
+    Parameters:
+    ----------
+    chron          : numpy.ndarray (depth x ens) of chronology data in years
+    """
+    chron_sorted = np.sort(chron, axis=0) # nans are sorted to the end
+    equal = chron_sorted[1:] == chron_sorted[:-1]
+    # count each duplicated year once (first pair of a run of equal years)
+    first = equal & (np.vstack([np.zeros((1, chron.shape[1]), dtype=bool), equal[:-1]])==False)
+    return first.sum(axis=0)
+
+def _sim_matrix(sim_data, sim_members, n_ens):
+    """
+    Returns the year axis of the simulation data, the simulation data as (sim ensemble member x year) numpy.ndarray and 
+    the row of this array which is paired with each age ensemble member. Helper function for cupsm.time2chron().
+
+    Parameters:
+    ----------
+    sim_data       : xarray Dataarray; simulation data resampled to years, can contain the dimension "ensemble_member".
+    sim_members    : array of the simulation data ensemble members paired with the age ensemble members, or None if 
+                       sim_data does not contain ensemble members.
+    n_ens          : integer; number of age ensemble members
+    """
+    years = sim_data.year.values
+    if sim_members is None:
+        sim_values = sim_data.values[np.newaxis, :]
+        rows = np.zeros(n_ens, dtype=int)
+    else:
+        sim_values = sim_data.transpose("ensemble_member", "year").values
+        rows = sim_data.indexes["ensemble_member"].get_indexer(sim_members)
+    return years, sim_values, rows
+
+def _nearest_index(years, values):
+    """
+    Returns the indices of the years closest to the given values (ties are resolved to the later year, like xarray's 
+    .sel(method="nearest")). Helper function for cupsm._sampfunc_slice2point().
+
+    Parameters:
+    ----------
+    years          : sorted numpy.ndarray of years
+    values         : numpy.ndarray of values
+    """
+    pos = np.clip(np.searchsorted(years, values), 1, max(len(years)-1, 1))
+    left, right = pos - 1, np.minimum(pos, len(years)-1)
+    return np.where(values - years[left] < years[right] - values, left, right)
+
+def _compress(chron):
+    """
+    Moves the non-nan values of each member (column) of the chronology matrix to the top, keeping their order. 
+    Returns the compressed matrix, the order (for cupsm._uncompress()) and the number of non-nan values per member.
+    Helper function for cupsm._create_bounds_adjacent().
+
+    Parameters:
+    ----------
+    chron          : numpy.ndarray (depth x ens) of chronology data in years
+    """
+    notnull = np.isnan(chron)==False
+    order = np.argsort(notnull==False, axis=0, kind="stable")
+    return np.take_along_axis(chron, order, axis=0), order, notnull.sum(axis=0)
+
+def _uncompress(values, order):
+    """
+    Inverse of cupsm._compress(). Helper function for cupsm._create_bounds_adjacent().
+
+    Parameters:
+    ----------
+    values         : numpy.ndarray (depth x ens) in the compressed order
+    order          : numpy.ndarray (depth x ens) returned by cupsm._compress()
+    """
+    result = np.empty_like(values)
+    np.put_along_axis(result, order, values, axis=0)
+    return result
+
+def _interp_members(x, depth, chron, notnull):
+    """
+    Linear interpolation of the ages of each age ensemble member at the depths x, as numpy.interp(x[:, i], 
+    depth[notnull[:, i]], chron[notnull[:, i], i]) but for all members at once: the depths are located on the common depth 
+    axis, the neighbouring data points of each member are found from the running last (next) data point along the depth 
+    axis. Returns a numpy.ndarray of the shape of x. Helper function for cupsm._create_bounds_distant().
+
+    Parameters:
+    ----------
+    x              : numpy.ndarray (... x ens) of depths in meter
+    depth          : numpy.ndarray; depth axis of the chronology data in meter (ascending)
+    chron          : numpy.ndarray (depth x ens) of chronology data in years
+    notnull        : numpy.ndarray (depth x ens); True for the data points of the chronology data
+    """
+    n_depth, n_ens = chron.shape
+    rows = np.arange(n_depth)[:, np.newaxis]
+    cols = np.arange(n_ens)
+    # last data point at or above and next data point at or below each depth (n_depth if there is none)
+    prev_point = np.maximum.accumulate(np.where(notnull, rows, -1), axis=0).ravel()
+    next_point = np.minimum.accumulate(np.where(notnull, rows, n_depth)[::-1], axis=0)[::-1].ravel()
+
+    # data points left (depth <= x) and right (depth > x) of x (flat indices of the depth x ens arrays)
+    pos = np.searchsorted(depth, x, side="right")
+    left = np.where(pos > 0, prev_point.take(np.maximum(pos-1, 0) * n_ens + cols), -1)
+    right = np.where(pos < n_depth, next_point.take(np.minimum(pos, n_depth-1) * n_ens + cols), n_depth)
+    has_left, has_right = left >= 0, right < n_depth
+    left, right = np.clip(left, 0, n_depth-1), np.clip(right, 0, n_depth-1)
+
+    age_left, age_right = chron.ravel().take(left * n_ens + cols), chron.ravel().take(right * n_ens + cols)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        slope = (age_right - age_left) / (depth[right] - depth[left])
+        inner = slope * (x - depth[left]) + age_left
+    # outside of the data points: first or last data point
+    return np.where(has_left & has_right, inner, np.where(has_left, age_left, age_right))
+
+def _round_to_depth_axis(depth, start, stop, step):
+    """
+    Returns the nearest values on the depth axes numpy.arange(start, stop, step) (one per member) for the given depths, 
+    without creating the depth axes. Helper function for cupsm._create_bounds_distant().
+
+    Parameters:
+    ----------
+    depth          : numpy.ndarray (depth x ens) of depths in meter
+    start          : numpy.ndarray (ens) of the first depths of the depth axes
+    stop           : numpy.ndarray (ens) of the (excluded) ends of the depth axes
+    step           : float; resolution of the depth axes in meter
+    """
+    n_steps = np.ceil((stop - start) / step) # length of the depth axes
+    delta = (start + step) - start # step as used by numpy.arange
+    ind = np.clip(np.floor((depth - start) / delta), 0, n_steps - 1)
+    left = start + ind * delta
+    right = start + np.minimum(ind + 1, n_steps - 1) * delta
+    # ties are resolved to the larger depth, like xarray's .sel(method="nearest")
+    return np.where(np.abs(depth - left) < np.abs(right - depth), left, right)
+
+def _get_engine(engine):
+    """
+    Checks the engine keyword of cupsm.time2chron() and resolves "auto". Helper function for cupsm.time2chron().
+
+    Parameters:
+    ----------
+    engine         : string; "auto", "numba" or "numpy"
+    """
+    if engine not in ["auto", "numba", "numpy"]:
+        raise ValueError("engine must be either 'auto', 'numba' or 'numpy'.")
+    if engine == "auto":
+        engine = "numba" if numba is not None else "numpy"
+    if engine == "numba" and numba is None:
+        raise ImportError("The engine 'numba' requires numba. Install numba or use engine='numpy'.")
+    return engine
+
+# ~~~~~~~~~~~~~~~~~~~~~~
+# Loop kernels (compiled with numba if available)
+# ~~~~~~~~~~~~~~~~~~~~~~
+def _point2point_loops(chron, years, sim_values, rows, out):
+    """
+    Loop version of the point2point mapping, writes into out (depth x ens, filled with nan). 
+    Helper function for cupsm._sampfunc_point2point().
+
+    Parameters:
+    ----------
+    chron          : numpy.ndarray (depth x ens) of chronology data in years
+    years          : numpy.ndarray; year axis of the simulation data
+    sim_values     : numpy.ndarray (sim ensemble member x year) of simulation data
+    rows           : numpy.ndarray; row of sim_values paired with each age ensemble member
+    out            : numpy.ndarray (depth x ens); result
+    """
+    n_years = len(years)
+    for j in range(chron.shape[1]):
+        for i in range(chron.shape[0]):
+            year = chron[i, j]
+            if np.isnan(year):
+                continue
+            pos = np.searchsorted(years, year)
+            if pos < n_years and years[pos] == year:
+                out[i, j] = sim_values[rows[j], pos]
+
+def _slice2point_loops(chron, lower_bounds, upper_bounds, years, sim_values, rows, out):
+    """
+    Loop version of the slice2point mapping, writes into out (depth x ens, filled with nan). Slices with nan bounds
+    are mapped to the nearest simulation year. Helper function for cupsm._sampfunc_slice2point().
+
+    Parameters:
+    ----------
+    chron          : numpy.ndarray (depth x ens) of chronology data in years
+    lower_bounds   : numpy.ndarray (depth x ens) of the lower slice bounds in years
+    upper_bounds   : numpy.ndarray (depth x ens) of the upper slice bounds in years
+    years          : numpy.ndarray; year axis of the simulation data
+    sim_values     : numpy.ndarray (sim ensemble member x year) of simulation data
+    rows           : numpy.ndarray; row of sim_values paired with each age ensemble member
+    out            : numpy.ndarray (depth x ens); result
+    """
+    n_years = len(years)
+    for j in range(chron.shape[1]):
+        r = rows[j]
+        for i in range(chron.shape[0]):
+            year = chron[i, j]
+            if np.isnan(year):
+                continue
+            if np.isnan(lower_bounds[i, j]) or np.isnan(upper_bounds[i, j]):
+                # nearest simulation year (ties are resolved to the later year)
+                pos = min(max(np.searchsorted(years, year), 1), max(n_years-1, 1))
+                left, right = pos - 1, min(pos, n_years-1)
+                if year - years[left] < years[right] - year:
+                    out[i, j] = sim_values[r, left]
+                else:
+                    out[i, j] = sim_values[r, right]
+                continue
+            # mean over the slice [lower, upper] (inclusive), nans excluded
+            start = np.searchsorted(years, lower_bounds[i, j], side="left")
+            stop = max(np.searchsorted(years, upper_bounds[i, j], side="right"), start)
+            total = 0.
+            count = 0
+            for k in range(start, stop):
+                value = sim_values[r, k]
+                if not np.isnan(value):
+                    total += value
+                    count += 1
+            if count > 0:
+                out[i, j] = total / count
+
+def _count_duplicates_loops(chron, out):
+    """
+    Loop version of cupsm._count_duplicates(), writes into out (ens). Helper function for cupsm._sampfunc_point2point().
+
+    Parameters:
+    ----------
+    chron          : numpy.ndarray (depth x ens) of chronology data in years
+    out            : numpy.ndarray (ens) of integers; result
+    """
+    for j in range(chron.shape[1]):
+        column = chron[:, j]
+        column = np.sort(column[np.isnan(column)==False])
+        for i in range(1, len(column)):
+            # count each duplicated year once (first pair of a run of equal years)
+            if column[i] == column[i-1] and (i == 1 or column[i-1] != column[i-2]):
+                out[j] += 1
+
+def _numba_kernel(function):
+    """
+    Returns the numba-compiled version of a loop kernel (compiled on the first call). The compiled code is cached on disk 
+    if a cache location is available, otherwise (e.g. for read-only installations) it is compiled without cache.
+    """
+    try:
+        return numba.njit(cache=True)(function)
+    except RuntimeError:
+        # no writable cache location
+        return numba.njit(function)
+
+if numba is not None:
+    _point2point_numba = _numba_kernel(_point2point_loops)
+    _slice2point_numba = _numba_kernel(_slice2point_loops)
+    _count_duplicates_numba = _numba_kernel(_count_duplicates_loops)
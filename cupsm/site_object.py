@@ -3,11 +3,86 @@ The module contains code to create the python class object from a loaded LiPD fi
 
 - class lipd2object
 - subclass target
+- class compact_site
 """
 
 # Imports
 import numpy as np
 import xarray as xr
+import functools
+import inspect
+from collections import OrderedDict
+
+# ~~~~~~~~~~~~~~~~~~~~~~
+# Helper functions
+# ~~~~~~~~~~~~~~~~~~~~~~
+
+def _memoized(method):
+    """
+    Decorator for the load methods of lipd2object: results are kept in memory per object and argument combination 
+    (see lipd2object.memo_max_bytes). Calls with save_in_object=True are not memoized.
+    """
+    signature = inspect.signature(method)
+    
+    def hashable(value):
+        if isinstance(value, (list, tuple)):
+            return tuple(hashable(v) for v in value)
+        return value
+    
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        arguments = signature.bind(self, *args, **kwargs)
+        arguments.apply_defaults()
+        arguments = {name: value for name, value in arguments.arguments.items() if name != "self"}
+        if arguments.get("save_in_object", False):
+            return method(self, *args, **kwargs)
+        key = (method.__name__,) + tuple((name, hashable(value)) for name, value in arguments.items())
+        return self.memo(key, lambda: method(self, *args, **kwargs))
+    return wrapper
+
+def _copy_arrays(arrays):
+    """
+    Returns a copy of a dictionary of numpy arrays (with copies of the arrays). Used by compact_site.
+    """
+    return {name: np.array(array, copy=True) for name, array in arrays.items()}
+
+def _chron_arrays(data_dic, site_name):
+    """
+    Collects the depth axis and the age model ensemble (depth x ens) from the columns of a LiPD ensemble table. Returns 
+    the depth array, the ensemble array, the name and unit of the depth axis and the name and unit of the ages.
+    """
+    #iterate through cols and collect data
+    age_data_list = []
+    ens_count=0
+    for col in data_dic.keys():
+        # depth data
+        if col == 'depth':
+            depth_data=np.array(data_dic[col]['values'])
+            depth_unit=data_dic[col]['units']
+            depth_name=data_dic[col]['variableName']
+        
+        # age model data                
+        elif "ens" in col:
+            data=np.array(data_dic[col]['values'], dtype=float)
+            age_data_list.append(data)
+            # check data attributes
+            if ens_count == 0:
+                data_unit=data_dic[col]['units']
+                data_name=data_dic[col]['variableName'].split("-")[0]
+                N = len(data)
+            else:
+                # check whether properties are unchanged
+                temp_data_unit=data_dic[col]['units']
+                temp_data_name=data_dic[col]['variableName'].split("-")[0]
+                temp_N = len(data)
+                if (temp_data_unit, temp_data_name, temp_N) != (data_unit, data_name, N):
+                    raise AttributeError(f"""
+                    Proxy record {site_name}: The attributes in the age model ensemble data are not consistent.
+                    Please load the data manually""")
+            ens_count+=1 # increase counter
+    
+    age_model_data = np.stack(age_data_list).T
+    return depth_data, age_model_data, depth_name, depth_unit, data_name, data_unit
 
 # ~~~~~~~~~~~~~~~~~~~~~~
 # Proxy class objects
@@ -26,15 +101,21 @@ class lipd2object:
     - age:          the age axis of the proxa data
     - archive_type: archive type, e.g. marine sediment
     - av_ds:        available data sets
+    - cache_dir:    directory of the on-disk cache for the age model, proxy data and resampled simulation data (None if no cache is used)
     - coords:       proxy location in lon, lat, depth
     - fname:        name of the LiPD file
     - lipd:         the LiPD file as it is read in with the python lipd package
+    - memo_max_bytes: memory cap (bytes) of the in-memory results of the load methods and time2chron (None: no cap, 0: no memoization, 
+                    default). Memoization is enabled for all record objects with e.g. cupsm.lipd2object.memo_max_bytes = 256 * 2**20.
     - path:         the path where LiPD files are located
     - sitename:     name of the record site
     - target:       target object for proxy forward modeling (only available after running the method "create_target")
     
     Methods:
     ------------------------------------
+    - lazy:             creates a record object which reads its LiPD file on first access of the data (class method)
+    - clear_memo:       removes the in-memory results of the load methods, e.g. after changing lipd2object.lipd in place
+    - memo:             returns an in-memory result for a key, or computes and keeps it
     - create_target:    creates a target subclass for proxy forward modeling, saved in lipd2object.target attribute
     - info:             prints a basic overview of the record
     - load:             loads all proxy data and age model data and combines them in one xarray DataSet
@@ -45,7 +126,7 @@ class lipd2object:
     # Initialization
     #-----------------
     
-    def __init__(self, loaded_file, path=None, file_name=None):
+    def __init__(self, loaded_file, path=None, file_name=None, cache_dir=None):
         # basic
         self.lipd=loaded_file
         """ The lipd file as it is read in with the python lipd package """
@@ -57,6 +138,11 @@ class lipd2object:
         if file_name != None:
             self.fname=file_name
         """ Name of the LiPD file """
+
+        if cache_dir is not None and (path is None or file_name is None):
+            raise ValueError("The on-disk cache requires the path and file name of the LiPD file.")
+        self.cache_dir=cache_dir
+        """ Directory of the on-disk cache for the age model, proxy data and resampled simulation data """
             
         # from lipd file
         self.site_name=loaded_file['geo']['siteName']
@@ -78,8 +164,125 @@ class lipd2object:
             self.age=["unknown", "unknown"]
             """ The age axis of the proxa data """
             
+    # memory cap (bytes) of the in-memory results of the load methods; None: no cap, 0: no memoization (default)
+    memo_max_bytes = 0
+
+    # attributes which are read from the LiPD file by lazy record objects
+    _lazy_attributes = ("lipd", "site_name", "coords", "archive_type", "av_ds", "age")
+
+    @classmethod
+    def lazy(cls, path, file_name, reader="lipd", site_name=None, coords=None, archive_type=None, cache_dir=None, 
+             file_hash=None):
+        """
+        Creates a record object without reading the LiPD file. The file is read on first access of the LiPD data or of 
+        attributes which are not provided here. Site name, coordinates and archive type can be provided (e.g. from the 
+        overview table) to be available without reading the file.
+
+        Parameters:
+        ---------------------------------
+        :path:          string; the path where the LiPD file is located
+        :file_name:     string; name of the LiPD file
+        :reader:        string; "lipd" (read with the lipd package) or "native" (see cupsm.read_lpd()). Default is "lipd".
+        :site_name:     string; name of the record site. Default is None (read from the file).
+        :coords:        list; proxy location in lon, lat, depth. Default is None (read from the file).
+        :archive_type:  string; archive type, e.g. marine sediment. Default is None (read from the file).
+        :cache_dir:     string; directory of the on-disk cache. If the age model and proxy data of the file are cached, 
+                        they are loaded from the cache without reading the LiPD file. Default is None (no cache).
+        :file_hash:     string; sha256 hash of the LiPD file (e.g. from the overview table), used as cache key. Default 
+                        is None (computed from the file if needed).
+        """
+        record = cls.__new__(cls)
+        record.path = path
+        record.fname = file_name
+        record._lazy_file = path+file_name
+        record._lazy_reader = reader
+        record.cache_dir = cache_dir
+        record._file_hash = file_hash
+        for name, value in [("site_name", site_name), ("coords", coords), ("archive_type", archive_type)]:
+            if value is not None:
+                setattr(record, name, value)
+        return record
+
+    def __getattr__(self, name):
+        # only called if the attribute does not exist: lazy record objects read their LiPD file now
+        if name in lipd2object._lazy_attributes and self.__dict__.get("_lazy_file") is not None:
+            from .utilities_lipd import _read_lipd_file
+            loaded_file = _read_lipd_file(self._lazy_file, self.__dict__.get("_lazy_reader", "lipd"))
+            self._lazy_file = None
+            self.__init__(loaded_file, path=self.path, file_name=self.fname, cache_dir=self.cache_dir)
+            return getattr(self, name)
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+    def _cached(self, part):
+        # arrays and meta data of the age model ("chron") or proxy data ("paleo") from the on-disk cache, or None
+        if getattr(self, "cache_dir", None) is None:
+            return None
+        from .utilities_lipd import _cache_load
+        return _cache_load(self.cache_dir, self._cache_key(), part)
+
+    def _to_cache(self, part, arrays, meta):
+        # saves arrays and meta data of the age model ("chron") or proxy data ("paleo") in the on-disk cache
+        if getattr(self, "cache_dir", None) is None:
+            return
+        from .utilities_lipd import _cache_save
+        _cache_save(self.cache_dir, self._cache_key(), part, arrays, meta)
+
+    def _cache_key(self):
+        # the cache is content-addressed: the key is the sha256 hash of the LiPD file
+        if getattr(self, "_file_hash", None) is None:
+            from .utilities_lipd import _file_info
+            self._file_hash = _file_info(self.path, self.fname)["file_hash"]
+        return self._file_hash
+
     # Functions
     #-----------------
+
+    def memo(self, key, function):
+        """
+        Returns the in-memory result for the given key, or computes it by calling function() and keeps it. The results are 
+        xarray objects, the least recently used ones are removed if their total size exceeds memo_max_bytes. A deep copy is 
+        returned, so changing the returned object (including in-place changes of its values) does not change the kept result.
+        Changes inside the LiPD dictionary (lipd2object.lipd) are not tracked, call clear_memo() after changing it in place 
+        (assigning a new LiPD dictionary to lipd2object.lipd clears the results).
+        Used by the load methods, cupsm.provide_chron_data() and cupsm.time2chron() (resampled simulation data).
+
+        Parameters:
+        ---------------------------------
+        :key:           hashable; key of the result, e.g. method name and arguments
+        :function:      callable without arguments; computes the result
+        """
+        if self.memo_max_bytes == 0:
+            return function()
+        results = getattr(self, "_memo_results", None)
+        if results is None:
+            results = self._memo_results = OrderedDict()
+        if key in results:
+            results.move_to_end(key)
+            return results[key].copy(deep=True)
+        
+        result = function()
+        if self.memo_max_bytes is None or result.nbytes <= self.memo_max_bytes:
+            results[key] = result
+            # remove least recently used results
+            while self.memo_max_bytes is not None and sum(r.nbytes for r in results.values()) > self.memo_max_bytes:
+                results.popitem(last=False)
+        return result.copy(deep=True)
+
+    def _has_chron_data(self):
+        # whether the record has age model data
+        return 'chronData' in self.lipd.keys()
+
+    def clear_memo(self):
+        """
+        Removes the in-memory results of the load methods, e.g. after changing the LiPD data in lipd2object.lipd in place.
+        """
+        self._memo_results = OrderedDict()
+
+    def __setattr__(self, name, value):
+        # the in-memory results of the load methods depend on the LiPD data
+        if name == "lipd" and getattr(self, "_memo_results", None):
+            self.clear_memo()
+        object.__setattr__(self, name, value)
     
     def info(self, meta=False):
         """
@@ -107,7 +310,7 @@ available datasets:
                           "age_max" : age[-1],
             }
 
-            if 'chronData' in self.lipd.keys():
+            if self._has_chron_data():
                 proxy_dict["agemodel"] = True
 
             ds_list = ['depth_merged', 'age', 'planktonic.d18O', 'planktonic.d18O-1', 'benthic.d18O', 
@@ -146,6 +349,7 @@ available datasets:
                     
 
 
+    @_memoized
     def load_chron_data(self, save_in_object=False):
         """
         Loads the age model data. Returns an xarray DataArray for the age model data with dimensions depth and ens where ens stands for the 
@@ -155,74 +359,56 @@ available datasets:
         ---------------------------------
         :save_in_object:  boolean; if True, the loaded data is available with the .data attribute. No xarray DataArray is returned.
         """
-        if 'chronData' in self.lipd.keys():
+        cached = self._cached("chron")
+        if cached is not None:
+            # arrays from the on-disk cache
+            arrays, meta = cached
+            depth_data, age_model_data = arrays["depth"], arrays["ages"]
+            depth_name, depth_unit, data_name, data_unit = meta["depth_name"], meta["depth_unit"], meta["name"], meta["units"]
+            ens_count = age_model_data.shape[1]
+        
+        elif 'chronData' in self.lipd.keys():
             
             # get to the data level in the lipd file
             data_dic = self.lipd['chronData']['chron0']['model']['chron0model0']['ensembleTable']['chron0model0ensemble0']['columns']
-            
-            #iterate through cols and collect data
-            age_data_list = []
-            ens_count=0
-            for col in data_dic.keys():
-                # depth data
-                if col == 'depth':
-                    depth_data=np.array(data_dic[col]['values'])
-                    depth_unit=data_dic[col]['units']
-                    depth_name=data_dic[col]['variableName']
-                
-                # age model data                
-                elif "ens" in col:
-                    data=np.array(data_dic[col]['values'], dtype=float)
-                    age_data_list.append(data)
-                    # check data attributes
-                    if ens_count == 0:
-                        data_unit=data_dic[col]['units']
-                        data_name=data_dic[col]['variableName'].split("-")[0]
-                        N = len(data)
-                    else:
-                        # check whether properties are unchanged
-                        temp_data_unit=data_dic[col]['units']
-                        temp_data_name=data_dic[col]['variableName'].split("-")[0]
-                        temp_N = len(data)
-                        if (temp_data_unit, temp_data_name, temp_N) != (data_unit, data_name, N):
-                            raise AttributeError(f"""
-                            Proxy record {self.site_name}: The attributes in the age model ensemble data are not consistent.
-                            Please load the data manually""")
-                    ens_count+=1 # increase counter
-            
-            # create xr data array
-            age_model_data = np.stack(age_data_list).T
-            xr_ds = xr.DataArray(
-                data=age_model_data,
-                dims=[depth_name, "ens"],
-                coords={depth_name: depth_data,
-                        "ens":np.arange(1,ens_count+1)},
-                attrs= {"units": data_unit},
-                name=data_name                      
-            )
-            xr_ds['depth'].attrs = {"units": depth_unit}
-
-            # drop duplicates
-            xr_ds.drop_duplicates(dim=depth_name)
-            
-            if save_in_object:
-                try:
-                    self.data
-                except AttributeError:
-                    self.data = xr_ds
-                    return
-                else:
-                    if isinstance(self.data, xr.Dataset):
-                        merged = xr.merge([self.data, xr_ds], join="outer", compat='override')
-                        self.data = merged
-                        return
-                    else:
-                        raise TypeError("Instance data is of unknown type.")
-            
-            return xr_ds
+            depth_data, age_model_data, depth_name, depth_unit, data_name, data_unit = _chron_arrays(data_dic, self.site_name)
+            ens_count = age_model_data.shape[1]
+            self._to_cache("chron", {"depth": depth_data, "ages": age_model_data}, 
+                           {"depth_name": depth_name, "depth_unit": depth_unit, "name": data_name, "units": data_unit})
         else:
             raise KeyError(f"No age model data found in for proxy record from {self.site_name}.")
+
+        # create xr data array
+        xr_ds = xr.DataArray(
+            data=age_model_data,
+            dims=[depth_name, "ens"],
+            coords={depth_name: depth_data,
+                    "ens":np.arange(1,ens_count+1)},
+            attrs= {"units": data_unit},
+            name=data_name                      
+        )
+        xr_ds['depth'].attrs = {"units": depth_unit}
+
+        # drop duplicates
+        xr_ds.drop_duplicates(dim=depth_name)
+        
+        if save_in_object:
+            try:
+                self.data
+            except AttributeError:
+                self.data = xr_ds
+                return
+            else:
+                if isinstance(self.data, xr.Dataset):
+                    merged = xr.merge([self.data, xr_ds], join="outer", compat='override')
+                    self.data = merged
+                    return
+                else:
+                    raise TypeError("Instance data is of unknown type.")
+        
+        return xr_ds
             
+    @_memoized
     def load_paleo_data(self, data_set, coord="depth", quiet=False, save_in_object=False):
         """
         Loads the proxy data. Data to be loaded can be chosen by data_set parameter. You can put "all" to load all available data. You can chose whether you want to work on the age or depth coordinate with the coord keyword argument. Returns an xarray DataArray for the given data_set keyword. The coordinate can be depth or age.
@@ -239,13 +425,17 @@ available datasets:
         """
         # Preparation
         print_naming_warning = False
+        
+        # get to the data level in the lipd file (or the on-disk cache)
+        lipd_data_dic = self._paleo_columns()
+        av_ds = list(lipd_data_dic.keys())
         #---
         # Put desired keys in a list & check whether data is available
         if data_set == "all" or data_set == ["all"]:
-            data_set=self.av_ds
-        elif data_set in self.av_ds:
+            data_set=av_ds
+        elif data_set in av_ds:
             data_set=[data_set]
-        elif not set(data_set) <= set(self.av_ds):
+        elif not set(data_set) <= set(av_ds):
             raise KeyError(f"The data set {data_set} is not available for proxy record from {self.site_name}.")
         
         # remove coordinate variable
@@ -262,9 +452,6 @@ available datasets:
         if coord == "depth": coord_name = "depth_merged"
         else: coord_name = coord
             
-        
-        # get to the data level in the lipd file
-        lipd_data_dic = self.lipd['paleoData']['paleo0']['measurementTable']['paleo0measurement0']['columns']
     
         # empty dics for data set creation
         data_dic = {}
@@ -336,6 +523,23 @@ available datasets:
                 
         return xr_ds
 
+    def _paleo_columns(self):
+        """
+        Returns the columns of the proxy data table (dictionary of variable name and column with meta data and values). 
+        If the object has an on-disk cache, the values are read from the cache.
+        """
+        cached = self._cached("paleo")
+        if cached is not None:
+            arrays, meta = cached
+            return {name: dict(attrs, values=arrays[name]) for name, attrs in meta["columns"]}
+        
+        columns = self.lipd['paleoData']['paleo0']['measurementTable']['paleo0measurement0']['columns']
+        self._to_cache("paleo", {name: np.array(column['values']) for name, column in columns.items()},
+                       {"columns": [[name, {key: value for key, value in column.items() if key != "values"}] 
+                                    for name, column in columns.items()]})
+        return columns
+
+    @_memoized
     def load(self, method="left", quiet=False, save_in_object=False):
         """
         Loads the proxy data and the age model data of the proxy and combines them in one single
@@ -417,3 +621,135 @@ available datasets:
                 self.month_i = None
     
             
+
+class compact_site:
+    """
+    Compact version of the record object lipd2object for holding many records in memory. The age axis, the depth axis and 
+    the age model ensemble are kept as float64 numpy arrays, the attributes are stored in __slots__. By default, the LiPD 
+    dictionary is released after extraction and the proxy data columns are read again from the LiPD file (or the on-disk 
+    cache) on first use. The load methods, info and create_target work as for lipd2object. Usually, the class is created 
+    with get_records_df(..., compact=True).
+
+    Attributes:
+    ------------------------------------
+    - age:          the age axis of the proxy data (float64 array)
+    - archive_type: archive type, e.g. marine sediment
+    - av_ds:        available data sets
+    - cache_dir:    directory of the on-disk cache for the age model, proxy data and resampled simulation data (None if no cache is used)
+    - coords:       proxy location in lon, lat, depth (float64 array)
+    - depth:        the depth axis of the proxy data (float64 array, None if not available)
+    - fname:        name of the LiPD file
+    - lipd:         the LiPD file as it is read in with the python lipd package (None if released)
+    - path:         the path where LiPD files are located
+    - site_name:    name of the record site
+    - target:       target object for proxy forward modeling (only available after running the method "create_target")
+
+    Methods:
+    ------------------------------------
+    - release_lipd:     releases the LiPD dictionary
+    - see lipd2object for the other methods (memoization is switched off by default, see lipd2object.memo_max_bytes)
+
+    Parameters:
+    ------------------------------------
+    :loaded_file:   dictionary; LiPD file as it is read in with the python lipd package (or cupsm.read_lpd())
+    :path:          string; the path where the LiPD file is located
+    :file_name:     string; name of the LiPD file
+    :keep_lipd:     boolean; if True, the LiPD dictionary is kept in the attribute lipd. Default is False.
+    :reader:        string; "lipd" or "native", reader for loading the proxy data columns from the LiPD file. Default is "lipd".
+    :cache_dir:     string; directory of the on-disk cache. Default is None (no cache).
+    """
+    __slots__ = ("lipd", "path", "fname", "cache_dir", "site_name", "coords", "archive_type", "av_ds", "age", "depth", 
+                 "target", "data", "_chron", "_columns", "_values", "_reader", "_file_hash", "_memo_results")
+
+    # memory cap (bytes) of the in-memory results of the load methods; None: no cap, 0: no memoization (default)
+    memo_max_bytes = 0
+
+    def __init__(self, loaded_file, path=None, file_name=None, keep_lipd=False, reader="lipd", cache_dir=None):
+        record = lipd2object(loaded_file, path=path, file_name=file_name, cache_dir=cache_dir)
+        self.path = path
+        self.fname = file_name
+        self.cache_dir = cache_dir
+        self._reader = reader
+        self.site_name = record.site_name
+        self.coords = np.array(record.coords, dtype=float)
+        self.archive_type = record.archive_type
+        self.av_ds = record.av_ds
+        try:
+            self.age = np.array(record.age).astype(float)
+        except ValueError:
+            self.age = record.age
+
+        columns = loaded_file['paleoData']['paleo0']['measurementTable']['paleo0measurement0']['columns']
+        self.depth = np.array(columns['depth_merged']['values']).astype(float) if 'depth_merged' in columns else None
+        self._columns = [[name, {key: value for key, value in column.items() if key != "values"}] 
+                         for name, column in columns.items()]
+        # proxy data columns: read on first use if the LiPD dictionary is released
+        if not keep_lipd and (path is None or file_name is None):
+            self._values = {name: np.array(column['values']) for name, column in columns.items()}
+        else:
+            self._values = None
+
+        if 'chronData' in loaded_file.keys():
+            data_dic = loaded_file['chronData']['chron0']['model']['chron0model0']['ensembleTable']['chron0model0ensemble0']['columns']
+            depth_data, age_model_data, depth_name, depth_unit, data_name, data_unit = _chron_arrays(data_dic, self.site_name)
+            self._chron = ({"depth": depth_data, "ages": age_model_data}, 
+                           {"depth_name": depth_name, "depth_unit": depth_unit, "name": data_name, "units": data_unit})
+        else:
+            self._chron = None
+
+        self.lipd = loaded_file if keep_lipd else None
+
+    def release_lipd(self):
+        """
+        Releases the LiPD dictionary. The proxy data columns are read again from the LiPD file on first use.
+        """
+        if self.lipd is not None and self._values is None and (self.path is None or self.fname is None):
+            self._values = {name: np.array(column['values']) for name, column in 
+                            self.lipd['paleoData']['paleo0']['measurementTable']['paleo0measurement0']['columns'].items()}
+        self.lipd = None
+
+    def _cached(self, part):
+        # copies of the extracted arrays and meta data of the age model ("chron") or proxy data ("paleo"), so that 
+        # changes of the loaded data do not change the record
+        if part == "chron":
+            return None if self._chron is None else (_copy_arrays(self._chron[0]), self._chron[1])
+        if self._values is not None:
+            return _copy_arrays(self._values), {"columns": self._columns}
+        if self.lipd is not None:
+            columns = self.lipd['paleoData']['paleo0']['measurementTable']['paleo0measurement0']['columns']
+            return {name: column['values'] for name, column in columns.items()}, {"columns": self._columns}
+        
+        # read the proxy data columns from the on-disk cache or the LiPD file
+        cached = lipd2object._cached(self, "paleo")
+        if cached is None:
+            from .utilities_lipd import _read_lipd_file
+            loaded_file = _read_lipd_file(self.path+self.fname, self._reader)
+            columns = loaded_file['paleoData']['paleo0']['measurementTable']['paleo0measurement0']['columns']
+            values = {name: np.array(column['values']) for name, column in columns.items()}
+            self._to_cache("paleo", values, {"columns": self._columns})
+        else:
+            values = cached[0]
+        self._values = values
+        return _copy_arrays(self._values), {"columns": self._columns}
+
+    def _has_chron_data(self):
+        # whether the record has age model data
+        return self._chron is not None
+
+    def load_chron_data(self, save_in_object=False):
+        if self._chron is None:
+            raise KeyError(f"No age model data found in for proxy record from {self.site_name}.")
+        return lipd2object.load_chron_data(self, save_in_object=save_in_object)
+    load_chron_data.__doc__ = lipd2object.load_chron_data.__doc__
+
+    # methods of lipd2object
+    info = lipd2object.info
+    load_paleo_data = lipd2object.load_paleo_data
+    load = lipd2object.load
+    create_target = lipd2object.create_target
+    memo = lipd2object.memo
+    clear_memo = lipd2object.clear_memo
+    __setattr__ = lipd2object.__setattr__
+    _paleo_columns = lipd2object._paleo_columns
+    _to_cache = lipd2object._to_cache
+    _cache_key = lipd2object._cache_key
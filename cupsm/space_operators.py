@@ -2,21 +2,38 @@
 The code of this module deals with the spatial dimension. The forward-modeling operator "field2site" interpolates the simulation data (lon, lat, time) to a proxy site location. Two customizable interpolation methods are available. It contains:
 
  - space operator "field2site"
+ - space operator "fields2sites"
+ - space operator helpers:
+
+    - function "create_site_weights"
+    - class "SiteWeights"
+    - class "GridIndex"
  
 """
 # Further helper functions (excluded from ReadTheDocs documentation)
 #    - function "_dx_dy_in_meter"
+#    - function "_search_box"
+#    - function "_prepare_field"
+#    - function "_grid_coords"
+#    - function "_check_grid"
+#    - function "_site_weights_from_distances"
+#    - function "_gather_cells"
+#    - function "_valid_cells"
+#    - function "_candidate_cells"
+#    - function "_plot_mask"
+#    - function "_apply_weight_matrix"
 
 # Imports
 from .utilities import *
 import numpy as np
 import xarray as xr
-from geopy.distance import great_circle
+from .utilities import _great_circle_m, _unit_vectors, _EARTH_RADIUS_M
 
 # ~~~~~~~~~~~~~~~~~~~~~~
 # Space operator 
 # ~~~~~~~~~~~~~~~~~~~~~~
-def field2site(sim_data, site_object, method="dist", radius_km=500, plot_mask=False):
+def field2site(sim_data, site_object, method="dist", radius_km=500, plot_mask=False, site_weights=None, grid_index=None,
+               land_mask=None, nan_check_steps=None):
     """
     Interpolates the simulation data to the location of the given site. 
     Returns an xarray DataArray.
@@ -25,7 +42,13 @@ def field2site(sim_data, site_object, method="dist", radius_km=500, plot_mask=Fa
     ------------------------------
     --> Usually LiPD files report the coordinate longitude between -180°E and +180°E, so the longitude coordinate of the field may be transformed accordingly.
     
-    --> To avoid artefacts, grid cells that are nan (empty/undefined) at any point on the time axis are ignored for the entire calculation. 
+    --> To avoid artefacts, grid cells that are nan (empty/undefined) at any point on the time axis are ignored for the entire calculation. Alternatively, a static land mask can be provided or the nan check can be restricted to the first time steps (see keywords land_mask and nan_check_steps).
+
+    --> For dask-backed fields, the result is a lazy dask array (chunked along time like the field), so it can be combined with further operators (e.g. cupsm.time2chron()) before computing.
+
+    --> If the operator is applied several times to fields on the same grid (e.g. for several variables or simulation runs), the weights can be computed once with cupsm.create_site_weights() and handed over with the site_weights keyword.
+
+    --> Curvilinear or unstructured grids (e.g. native ocean model grids) are supported if the longitudes and latitudes of the grid cell centers are provided as coordinates 'lon' and 'lat' (e.g. with dimensions 'j' and 'i'). The grid cells are then found with a spatial index (see cupsm.GridIndex), which requires scipy.
     
     Parameters:
     ------------------------------
@@ -37,10 +60,52 @@ def field2site(sim_data, site_object, method="dist", radius_km=500, plot_mask=Fa
     :radius_km:	Radius in km within which grid cell centers should be considered. 
                 The default is radius_km=500.
     :plot_mask:	boolean; optional diagnostic plot of the weighting mask. Default is False.
+    :site_weights:	SiteWeights object; precomputed weights (see cupsm.create_site_weights()). If provided, method, radius_km,
+                plot_mask, grid_index, land_mask and nan_check_steps are ignored. Default is None (weights are computed from sim_data).
+    :grid_index:	GridIndex object; spatial index of the grid of sim_data (see cupsm.GridIndex). Default is None (for regular
+                grids, the grid cells are searched in a lon-lat box around the site; for other grids an index is created).
+    :land_mask:	xarray DataArray on the grid of sim_data without time axis (e.g. a land-sea mask), True (or 1) for grid cells
+                which should be ignored. If provided, sim_data is not scanned for nan values. Default is None.
+    :nan_check_steps:	integer; number of time steps (from the start of the time axis) which are scanned for nan values.
+                Default is None (entire time axis).
+    """
+    if site_weights is None:
+        site_weights = create_site_weights(sim_data, site_object, method=method, radius_km=radius_km, plot_mask=plot_mask,
+                                           grid_index=grid_index, land_mask=land_mask, nan_check_steps=nan_check_steps)
+    return site_weights.apply(sim_data)
+
+def create_site_weights(sim_data, site_object, method="dist", radius_km=500, plot_mask=False, grid_index=None,
+                        land_mask=None, nan_check_steps=None):
+    """
+    Computes the weights used by cupsm.field2site() to interpolate fields on the grid of sim_data to the location of the given site.
+    Returns a SiteWeights object which can be applied to any field on the same grid (see cupsm.SiteWeights).
+
+    Notes:
+    ------------------------------
+    --> Grid cells that are nan (empty/undefined) at any point on the time axis of sim_data are ignored, so the weights should be created from a field with the same nan (e.g. land) mask as the fields they are applied to.
+
+    --> The nan check is a lazy reduction over the grid cells within the radius, so dask-backed fields are never loaded into memory as a whole. For long simulations, it can be restricted to the first time steps (nan_check_steps) or replaced by a static land mask (land_mask).
+    
+    Parameters:
+    ------------------------------
+    :sim_data:	xarray DataArray of simulation data of interest.
+    :site_object:	Site object of interest (python class object created from lipd file of interest by applying cupsm.get_records_df(), see cupsm.get_records_df() documentation for more details).
+    :method:	string; Method for interpolation; available keywords: "dist" (distance weighted
+                mean over grid cells which are within radius) and "nn" (nearest grid cell
+                which is not nan). Default is "dist".
+    :radius_km:	Radius in km within which grid cell centers should be considered. 
+                The default is radius_km=500.
+    :plot_mask:	boolean; optional diagnostic plot of the weighting mask. Default is False.
+    :grid_index:	GridIndex object; spatial index of the grid of sim_data (see cupsm.GridIndex). Default is None (for regular
+                grids, the grid cells are searched in a lon-lat box around the site; for other grids an index is created).
+    :land_mask:	xarray DataArray on the grid of sim_data without time axis (e.g. a land-sea mask), True (or 1) for grid cells
+                which should be ignored. If provided, sim_data is not scanned for nan values. Default is None.
+    :nan_check_steps:	integer; number of time steps (from the start of the time axis) which are scanned for nan values.
+                Default is None (entire time axis).
     """
     # set variables
     x,y,_ = site_object.coords
-    field = do_to_180(sim_data) # set longitude axis to -180, 180 as it standard in lipd
+    field, grid_dims = _prepare_field(sim_data)
     lon = field.coords["lon"]
     lat = field.coords["lat"]
     radius_m = radius_km*1e3 # radius in meters
@@ -49,105 +114,345 @@ def field2site(sim_data, site_object, method="dist", radius_km=500, plot_mask=Fa
     if method not in ["dist", "nn"]:
         raise ValueError(f"Method {method} is not available.")
 
-    if not set(["lon","lat"]).issubset(set(field.dims)):
-        raise ValueError(f"The dimensions longitude and latitude must be named 'lon' and 'lat', the coordinates of the field are {field.coords}.")
+    if grid_index is None and not set(["lon","lat"]).issubset(set(field.dims)):
+        # curvilinear or unstructured grid
+        grid_index = GridIndex(field)
+    if grid_index is not None:
+        _check_grid(field, grid_index.lon, grid_index.lat)
 
-    # create a copy of field with nans in it (for weighting)
-    mask = xr.full_like(field, fill_value=np.nan)
-    if "time" in mask.dims:
-        mask = mask.mean("time")
-    
-    # identify closest grid cell indices
-    ind_lon1 = np.fabs((lon - x)).argsort(axis=-1)[:1].values
-    ind_lat1 = np.fabs((lat - y)).argsort(axis=-1)[:1].values
-    
-    # find the grid resolution
-    dx_arr, dy = _dx_dy_in_meter(lon, lat)
-    dx = dx_arr[ind_lat1].values[0]
-    
-    # stepsize for identifying relevant gridcells
-    step_lon = int(np.ceil(radius_m / dx))
-    step_lat = int(np.ceil(radius_m / dy))
+    # grid cells within the radius
+    grid_lon, grid_lat = _grid_coords(field, grid_dims)
+    flat_ind, w_dist = _candidate_cells(lon, lat, grid_lon, grid_lat, x, y, radius_m, grid_index)
+    ind = np.unravel_index(flat_ind, grid_lon.shape)
 
-    # relevant gridcell boundaries
-    lon_min, lon_max = lon[ind_lon1-step_lon].values[0], lon[ind_lon1+step_lon].values[0]
-    lat_min, lat_max = lat[ind_lat1-step_lat].values[0], lat[ind_lat1+step_lat].values[0]
+    # NAN check
+    valid = _valid_cells(field, grid_dims, ind, land_mask=land_mask, nan_check_steps=nan_check_steps)
+    ind = tuple(i[valid] for i in ind)
+    w_dist = w_dist[valid]
+    cell_lat = grid_lat[ind]
 
-    # floor/ceil to two digits
-    lon_min, lon_max = np.floor(lon_min * 100)/100, np.ceil(lon_max * 100)/100
-    lat_min, lat_max = np.floor(lat_min * 100)/100, np.ceil(lat_max * 100)/100
-    
-    # compute relevant slice for nan check 
-    selected_field = field.sel(lon=slice(lon_min, lon_max), lat=slice(lat_min, lat_max))
-    computed = selected_field.compute()
+    if plot_mask:
+        _plot_mask(field, grid_dims, ind, w_dist, method)
 
-    # create nan mask
-    nan_mask = np.isnan(computed).sum("time") #True >= 1, False == 0
-    nan_mask = xr.where(nan_mask != 0, 0, 1) #set values to 0 where there was nan, else 1
+    return _site_weights_from_distances(lon=lon.values, lat=lat.values, dims=grid_dims, ind=ind, cell_lat=cell_lat,
+                                        w_dist=w_dist, coords=[x, y], method=method, radius_km=radius_km)
 
-    # check whether mask is only zeros (only nan):
-    if np.all(nan_mask == np.zeros_like(nan_mask)):
-        raise ValueError(f"For the chosen proxy location at {x}°E and {y}°N and a radius of {radius} km, the given field does not provide values.")
-    
-    w_distance_sum = 0 # sum up all distances to normalize in the end to 1
-    
-    all_nan_check=True # boolean to check for NANs after iterations through lats and lons 
+def fields2sites(sim_data, site_objects, method="dist", radius_km=500, site_weights=None, backend="dense", grid_index=None,
+                 land_mask=None, nan_check_steps=None):
+    """
+    Interpolates the simulation data to the locations of several sites at once (see cupsm.field2site() for details on the interpolation). 
+    The grid cells required by all sites are collected and read in a single pass over the field, instead of one pass per site. 
+    Returns an xarray DataArray with the additional dimension "site" (site names as coordinate, site locations as 
+    coordinates "site_lon" and "site_lat").
+
+    Notes:
+    ------------------------------
+    --> The result is lazy for dask-backed fields, so the data is only read when the result is computed. To determine which grid cells are nan, the time series of the required grid cells are scanned once beforehand, unless precomputed site_weights are provided.
     
-    # iterate through relevant lats and lons and write values into mask
-    for r_lon in nan_mask.lon.values:
-        for r_lat in nan_mask.lat.values:
-            # NAN check
-            if nan_mask.sel(lon=r_lon, lat=r_lat, method="nearest").values == 0:
-                continue
-            else:
-                # max_dist - distance for weighting
-                dist = great_circle((r_lat, r_lon), (y,x)).m
-                w_dist = radius_m - dist
-                if w_dist < 0:
-                    continue
-                # add to sum
-                w_distance_sum += w_dist
-                # write distance into map 
-                mask.loc[dict(lon=r_lon, lat=r_lat)] = w_dist
-                all_nan_check=False 
-                
-    if all_nan_check==True:
-        raise ValueError(f"For the chosen proxy location at {x}°E and {y}°N and a radius of {radius_km} km, the given field does not provide values.") 
-
-
-    mask = (mask/w_distance_sum) # normalize to 1
-
-    if plot_mask and method == "dist":
-        # plot a diagnostic plot of the weighting mask
-        mask.rename("weighting [0-1]").plot()
-    elif plot_mask and method == "nn":
-        # set max to one and rest to nan
-        xr.where((mask==mask.max())==1, 1, np.nan).rename("weighting [0-1]").plot()
+    Parameters:
+    ------------------------------
+    :sim_data:	xarray DataArray of simulation data of interest.
+    :site_objects:	list or dictionary of site objects (e.g. obs_data created with cupsm.get_records_df()).
+    :method:	string; Method for interpolation; available keywords: "dist" (distance weighted
+                mean over grid cells which are within radius) and "nn" (nearest grid cell
+                which is not nan). Default is "dist".
+    :radius_km:	Radius in km within which grid cell centers should be considered. 
+                The default is radius_km=500.
+    :site_weights:	list of SiteWeights objects in the order of site_objects; precomputed weights (see cupsm.create_site_weights()). 
+                If provided, method, radius_km, grid_index, land_mask and nan_check_steps are ignored. Default is None (weights are computed from sim_data).
+    :backend:	string; how the (site x grid cell) weight matrix is applied; available keywords: "dense" (numpy array, 
+                memory scales with the number of sites times the number of required grid cells) and "sparse" (scipy.sparse 
+                CSR matrix applied per time chunk, memory scales with the number of non-zero weights; requires scipy). 
+                Default is "dense".
+    :grid_index:	GridIndex object; spatial index of the grid of sim_data (see cupsm.GridIndex). Default is None (for regular
+                grids, the grid cells are searched in a lon-lat box around each site; for other grids an index is created).
+    :land_mask:	xarray DataArray on the grid of sim_data without time axis (e.g. a land-sea mask), True (or 1) for grid cells
+                which should be ignored. If provided, sim_data is not scanned for nan values. Default is None.
+    :nan_check_steps:	integer; number of time steps (from the start of the time axis) which are scanned for nan values.
+                Default is None (entire time axis).
+    """
+    # set variables
+    if isinstance(site_objects, dict):
+        site_objects = list(site_objects.values())
+    field, grid_dims = _prepare_field(sim_data)
+    lon = field.coords["lon"]
+    lat = field.coords["lat"]
+    radius_m = radius_km*1e3 # radius in meters
 
-    if method == "dist":
-        selected_mask = mask.sel(lon=slice(lon_min, lon_max), lat=slice(lat_min, lat_max))
-        w = np.cos(np.deg2rad(lat)).sel(lat=slice(lat_min, lat_max)) # cosinus weighted
-        field_at_loc = xr.DataArray(data=(selected_field * selected_mask).weighted(w).sum(('lon', 'lat')),
-                                  attrs=field.attrs)
-    elif method == "nn":
-        # chose maximum from weighting mask                           
-        mask_argmax = mask.argmax(["lon", "lat"])
-        nn_lon_ind = int(mask_argmax["lon"])
-        nn_lat_ind = int(mask_argmax["lat"])
-        field_at_loc = xr.DataArray(data=(field.isel(lon=nn_lon_ind, lat=nn_lat_ind)),
-                                  attrs=field.attrs)
-        
+    # checks
+    if method not in ["dist", "nn"]:
+        raise ValueError(f"Method {method} is not available.")
+
+    if backend not in ["dense", "sparse"]:
+        raise ValueError(f"Backend {backend} is not available.")
+
+    if site_weights is not None and len(site_weights) != len(site_objects):
+        raise ValueError("One SiteWeights object per site object must be provided.")
+
+    # grid cell centers in the dimension order of the field
+    grid_lon, grid_lat = _grid_coords(field, grid_dims)
+    grid_shape = grid_lon.shape
+
+    if site_weights is None:
+        if grid_index is None and not set(["lon","lat"]).issubset(set(field.dims)):
+            # curvilinear or unstructured grid
+            grid_index = GridIndex(field)
+        if grid_index is not None:
+            _check_grid(field, grid_index.lon, grid_index.lat)
+
+        # max_dist - distance for weighting, grid cells within the radius of each site
+        candidates = []
+        for site_object in site_objects:
+            x,y,_ = site_object.coords
+            candidates.append(_candidate_cells(lon, lat, grid_lon, grid_lat, x, y, radius_m, grid_index))
         
-    try:
-        field_at_loc.attrs = {"lon": x,
-                              "lat" : y,
-                              "units" : field.attrs["units"]
-                              }
-    except KeyError:
-        field_at_loc.attrs = {"lon": x,
-                              "lat" : y,}
+        # nan check of all candidate grid cells in one pass
+        union = np.unique(np.concatenate([flat_ind for flat_ind, _ in candidates]))
+        valid = _valid_cells(field, grid_dims, np.unravel_index(union, grid_shape), 
+                             land_mask=land_mask, nan_check_steps=nan_check_steps)
+
+        # weights for each site
+        site_weights = []
+        for site_object, (flat_ind, w_dist) in zip(site_objects, candidates):
+            valid_site = valid[np.searchsorted(union, flat_ind)]
+            flat_ind, w_dist = flat_ind[valid_site], w_dist[valid_site]
+            site_weights.append(_site_weights_from_distances(lon=lon.values, lat=lat.values, dims=grid_dims,
+                                                             ind=np.unravel_index(flat_ind, grid_shape),
+                                                             cell_lat=grid_lat.ravel()[flat_ind], w_dist=w_dist, 
+                                                             coords=site_object.coords[:2], method=method, radius_km=radius_km))
+    else:
+        for sw in site_weights:
+            _check_grid(field, sw.lon, sw.lat)
+
+    # union of all contributing grid cells and weight matrix entries (site x cell)
+    flat_ind = [np.ravel_multi_index([sw.ind[sw.dims.index(d)] for d in grid_dims], grid_shape) for sw in site_weights]
+    union = np.unique(np.concatenate(flat_ind))
+    rows = np.concatenate([np.full(len(f_ind), i) for i, f_ind in enumerate(flat_ind)])
+    cols = np.searchsorted(union, np.concatenate(flat_ind))
+    weights = np.concatenate([sw.weights for sw in site_weights])
+    is_nn = np.concatenate([np.full(len(sw.weights), sw.method == "nn") for sw in site_weights])
+    shape = (len(site_weights), len(union))
+
+    # gather the grid cells in a single pass and compute the weighted sums (nans are skipped)
+    cells = _gather_cells(field, grid_dims, np.unravel_index(union, grid_shape))
+    field_at_locs = _apply_weight_matrix(cells.fillna(0.), rows, cols, weights, shape, backend)
+    if is_nn.any():
+        # nearest neighbour: nan values are kept
+        nn_isnull = _apply_weight_matrix(cells.isnull().astype(float), rows[is_nn], cols[is_nn], 
+                                         np.ones(is_nn.sum()), shape, backend)
+        field_at_locs = field_at_locs.where(nn_isnull == 0)
+
+    field_at_locs = field_at_locs.transpose("site", ...).assign_coords(
+        site=[site_object.site_name for site_object in site_objects],
+        site_lon=("site", [sw.coords[0] for sw in site_weights]),
+        site_lat=("site", [sw.coords[1] for sw in site_weights]))
+    field_at_locs.name = field.name
+    if "units" in field.attrs:
+        field_at_locs.attrs = {"units" : field.attrs["units"]}
         
-    return field_at_loc
+    return field_at_locs
+
+# ~~~~~~~~~~~~~~~~~~~~~~
+# Weights object
+# ~~~~~~~~~~~~~~~~~~~~~~
+class SiteWeights:
+    """
+    Holds the precomputed interpolation weights of a site for a given grid, created with cupsm.create_site_weights(). 
+    Applying the object to a field on the same grid only requires to gather the relevant grid cells and to compute a 
+    weighted sum, so the weights do not need to be recomputed for every variable or simulation run.
+
+    Attributes:
+    ------------------------------------
+    - coords:       site location in lon, lat
+    - dims:         names of the horizontal dimensions of the grid, e.g. ["lat", "lon"] or ["j", "i"]
+    - ind:          indices of the contributing grid cells, one array per dimension in dims
+    - lat:          latitudes of the grid
+    - lon:          longitudes of the grid (-180°E -> +180°E for regular grids)
+    - method:       interpolation method, "dist" or "nn"
+    - radius_km:    radius in km within which grid cell centers were considered
+    - weights:      weights of the contributing grid cells
+
+    Methods:
+    ------------------------------------
+    - apply:        interpolates a field on the same grid to the site location
+    - save:         saves the weights to a .npz file, which can be read in again with SiteWeights.load
+    """
+    # Initialization
+    #-----------------
+    
+    def __init__(self, lon, lat, dims, ind, weights, coords, method, radius_km):
+        self.lon = np.asarray(lon)
+        """ Longitudes of the grid (-180°E -> +180°E for regular grids) """
+
+        self.lat = np.asarray(lat)
+        """ Latitudes of the grid """
+
+        self.dims = list(dims)
+        """ Names of the horizontal dimensions of the grid """
+
+        self.ind = np.asarray(ind, dtype=int).reshape(len(self.dims), -1)
+        """ Indices of the contributing grid cells, one array per dimension in dims """
+
+        self.weights = np.asarray(weights, dtype=float)
+        """ Weights of the contributing grid cells """
+
+        self.coords = list(coords)
+        """ Site location in lon, lat """
+
+        self.method = method
+        """ Interpolation method, "dist" or "nn" """
+
+        self.radius_km = radius_km
+        """ Radius in km within which grid cell centers were considered """
+
+    # Functions
+    #-----------------
+
+    def apply(self, sim_data):
+        """
+        Interpolates the simulation data to the site location using the precomputed weights. 
+        Returns an xarray DataArray.
+
+        Parameters:
+        ------------------------------
+        :sim_data:	xarray DataArray of simulation data on the grid the weights were created for.
+        """
+        field, _ = _prepare_field(sim_data)
+        _check_grid(field, self.lon, self.lat)
+
+        if self.method == "dist":
+            # gather the contributing grid cells and compute the weighted sum (nans are skipped)
+            cells = _gather_cells(field, self.dims, self.ind)
+            field_at_loc = xr.dot(cells.fillna(0.), xr.DataArray(self.weights, dims="cell"), dim="cell")
+        elif self.method == "nn":
+            field_at_loc = field.isel({d: int(i[0]) for d, i in zip(self.dims, self.ind)})
+
+        x, y = self.coords
+        try:
+            field_at_loc.attrs = {"lon": x,
+                                  "lat" : y,
+                                  "units" : field.attrs["units"]
+                                  }
+        except KeyError:
+            field_at_loc.attrs = {"lon": x,
+                                  "lat" : y,}
+            
+        return field_at_loc
+
+    def save(self, file):
+        """
+        Saves the weights to a .npz file. The object can be recreated with SiteWeights.load(file).
+
+        Parameters:
+        ------------------------------
+        :file:	string; path and file name, should end with ".npz".
+        """
+        np.savez(file, lon=self.lon, lat=self.lat, dims=np.asarray(self.dims), ind=self.ind,
+                 weights=self.weights, coords=np.asarray(self.coords, dtype=float),
+                 method=np.asarray(self.method), radius_km=np.asarray(self.radius_km))
+
+    @classmethod
+    def load(cls, file):
+        """
+        Loads weights which were saved with SiteWeights.save(). Returns a SiteWeights object.
+
+        Parameters:
+        ------------------------------
+        :file:	string; path and file name of the .npz file.
+        """
+        with np.load(file) as data:
+            return cls(lon=data["lon"], lat=data["lat"], dims=data["dims"].tolist(), ind=data["ind"],
+                       weights=data["weights"], coords=data["coords"].tolist(), method=str(data["method"]),
+                       radius_km=data["radius_km"].item())
+
+# ~~~~~~~~~~~~~~~~~~~~~~
+# Spatial index
+# ~~~~~~~~~~~~~~~~~~~~~~
+class GridIndex:
+    """
+    Spherical spatial index over the grid cell centers of a field (KD-tree on 3-D unit vectors, requires scipy). 
+    The index is built once per grid and answers nearest neighbour and radius queries in O(log n) per site. It works for 
+    regular, curvilinear and unstructured grids, as long as the longitudes and latitudes of the grid cell centers are 
+    provided as coordinates 'lon' and 'lat'. It can be handed over to cupsm.field2site(), cupsm.create_site_weights() and 
+    cupsm.fields2sites() with the grid_index keyword.
+
+    Attributes:
+    ------------------------------------
+    - dims:         names of the horizontal dimensions of the grid, e.g. ["lat", "lon"] or ["j", "i"]
+    - grid_lat:     latitudes of all grid cell centers (shape of the grid)
+    - grid_lon:     longitudes of all grid cell centers (shape of the grid)
+    - lat:          latitude coordinate of the grid
+    - lon:          longitude coordinate of the grid
+    - shape:        shape of the grid
+
+    Methods:
+    ------------------------------------
+    - query_nearest:    returns the k grid cells closest to a location
+    - query_radius:     returns all grid cells within a radius around a location
+    """
+    # Initialization
+    #-----------------
+
+    def __init__(self, sim_data):
+        try:
+            from scipy.spatial import cKDTree
+        except ImportError:
+            raise ImportError("The grid index requires scipy. Please install scipy.")
+
+        field, grid_dims = _prepare_field(sim_data)
+
+        self.lon = field["lon"].values
+        """ Longitude coordinate of the grid """
+
+        self.lat = field["lat"].values
+        """ Latitude coordinate of the grid """
+
+        self.dims = grid_dims
+        """ Names of the horizontal dimensions of the grid """
+
+        self.grid_lon, self.grid_lat = _grid_coords(field, grid_dims)
+        """ Longitudes and latitudes of all grid cell centers """
+
+        self.shape = self.grid_lon.shape
+        """ Shape of the grid """
+
+        self._tree = cKDTree(_unit_vectors(self.grid_lon.ravel(), self.grid_lat.ravel()))
+
+    # Functions
+    #-----------------
+
+    def query_nearest(self, x, y, k=1):
+        """
+        Returns the flat indices (see numpy.unravel_index) of the k grid cells closest to the location (x, y) 
+        and their great circle distances in meters, sorted by distance.
+
+        Parameters:
+        ------------------------------
+        :x:   float; longitude in °E
+        :y:   float; latitude in °N
+        :k:   integer; number of grid cells. Default is 1.
+        """
+        _, flat_ind = self._tree.query(_unit_vectors(x, y), k=k)
+        flat_ind = np.atleast_1d(flat_ind)
+        return flat_ind, _great_circle_m(self.grid_lon.ravel()[flat_ind], self.grid_lat.ravel()[flat_ind], x, y)
+
+    def query_radius(self, x, y, radius_km):
+        """
+        Returns the flat indices (see numpy.unravel_index) of all grid cells within the radius around the location (x, y) 
+        and their great circle distances in meters, sorted by index (i.e. in the order of the grid).
+
+        Parameters:
+        ------------------------------
+        :x:           float; longitude in °E
+        :y:           float; latitude in °N
+        :radius_km:   float; radius in km
+        """
+        radius_m = radius_km*1e3
+        # great circle distance -> chord length on the unit sphere (with a small tolerance, exact check below)
+        chord = 2 * np.sin(min(radius_m / (2 * _EARTH_RADIUS_M), np.pi / 2)) * (1 + 1e-9)
+        flat_ind = np.sort(np.asarray(self._tree.query_ball_point(_unit_vectors(x, y), chord), dtype=int))
+        dist = _great_circle_m(self.grid_lon.ravel()[flat_ind], self.grid_lat.ravel()[flat_ind], x, y)
+        return flat_ind[dist <= radius_m], dist[dist <= radius_m]
     
 # ~~~~~~~~~~~~~~~~~~~~~~
 # Helper functions
@@ -184,3 +489,246 @@ def _dx_dy_in_meter(arr_x, arr_y):
     dy = d_1deg_lat * lat_res
 
     return dx, dy
+
+def _search_box(lon, lat, x, y, radius_m):
+    """
+    Returns the boundaries (lon_min, lon_max, lat_min, lat_max) of the box of grid cells which are relevant for a site at (x, y).
+    Helper function for cupsm.create_site_weights() and cupsm.fields2sites().
+
+    Parameters
+    ------------------------------
+    :lon:        xarray DataArray of longitudes
+    :lat:        xarray DataArray of latitudes
+    :x:          float; longitude of the site
+    :y:          float; latitude of the site
+    :radius_m:   float; radius in meters within which grid cell centers should be considered
+    """
+    # identify closest grid cell indices
+    ind_lon1 = np.fabs((lon - x)).argsort(axis=-1)[:1].values
+    ind_lat1 = np.fabs((lat - y)).argsort(axis=-1)[:1].values
+
+    # find the grid resolution
+    dx_arr, dy = _dx_dy_in_meter(lon, lat)
+    dx = dx_arr[ind_lat1].values[0]
+
+    # stepsize for identifying relevant gridcells
+    step_lon = int(np.ceil(radius_m / dx))
+    step_lat = int(np.ceil(radius_m / dy))
+
+    # relevant gridcell boundaries
+    lon_min, lon_max = lon[ind_lon1-step_lon].values[0], lon[ind_lon1+step_lon].values[0]
+    lat_min, lat_max = lat[ind_lat1-step_lat].values[0], lat[ind_lat1+step_lat].values[0]
+
+    # floor/ceil to two digits
+    lon_min, lon_max = np.floor(lon_min * 100)/100, np.ceil(lon_max * 100)/100
+    lat_min, lat_max = np.floor(lat_min * 100)/100, np.ceil(lat_max * 100)/100
+
+    return lon_min, lon_max, lat_min, lat_max
+
+def _prepare_field(sim_data):
+    """
+    Checks the horizontal coordinates of the simulation data and transforms the longitudes of regular grids to -180°E -> +180°E. 
+    Returns the field and the names of its horizontal dimensions (in the order of the field).
+    Helper function for the space operators.
+
+    Parameters
+    ------------------------------
+    :sim_data:   xarray DataArray of simulation data with coordinates 'lon' and 'lat'
+    """
+    if not set(["lon","lat"]).issubset(set(sim_data.coords)):
+        raise ValueError(f"The coordinates longitude and latitude must be named 'lon' and 'lat', the coordinates of the field are {sim_data.coords}.")
+
+    if "lon" in sim_data.dims:
+        field = do_to_180(sim_data) # set longitude axis to -180, 180 as it standard in lipd
+    else:
+        field = sim_data # curvilinear or unstructured grid, the distances do not depend on the longitude range
+
+    grid_dims = [d for d in field.dims if d in field["lon"].dims + field["lat"].dims]
+    return field, grid_dims
+
+def _grid_coords(field, grid_dims):
+    """
+    Returns the longitudes and latitudes of all grid cell centers as numpy arrays in the shape of the grid.
+    Helper function for the space operators.
+
+    Parameters
+    ------------------------------
+    :field:      xarray DataArray with coordinates 'lon' and 'lat'
+    :grid_dims:  list of the horizontal dimensions of the field
+    """
+    return [c.transpose(*grid_dims).values for c in xr.broadcast(field["lon"], field["lat"])]
+
+def _check_grid(field, lon, lat):
+    """
+    Raises a ValueError if the grid of the field does not match the given longitudes and latitudes.
+    Helper function for the space operators.
+
+    Parameters
+    ------------------------------
+    :field:      xarray DataArray with coordinates 'lon' and 'lat'
+    :lon:        array of longitudes of the expected grid
+    :lat:        array of latitudes of the expected grid
+    """
+    if not (np.array_equal(field["lon"].values, lon) and np.array_equal(field["lat"].values, lat)):
+        raise ValueError("The grid of the given field does not match the grid the weights or index were created for.")
+
+def _site_weights_from_distances(lon, lat, dims, ind, cell_lat, w_dist, coords, method, radius_km):
+    """
+    Creates a SiteWeights object from the weighting distances (radius - distance) of the valid grid cells within the radius.
+    Helper function for cupsm.create_site_weights() and cupsm.fields2sites().
+
+    Parameters
+    ------------------------------
+    :lon:        array of longitudes of the grid
+    :lat:        array of latitudes of the grid
+    :dims:       list of the horizontal dimensions of the grid
+    :ind:        tuple of index arrays (one per dimension in dims) of the valid grid cells, in the order of the grid
+    :cell_lat:   array of latitudes of the valid grid cells
+    :w_dist:     array of weighting distances of the valid grid cells in meters
+    :coords:     site location in lon, lat
+    :method:     string; interpolation method, "dist" or "nn"
+    :radius_km:  radius in km within which grid cell centers were considered
+    """
+    if len(w_dist) == 0:
+        raise ValueError(f"For the chosen proxy location at {coords[0]}°E and {coords[1]}°N and a radius of {radius_km} km, the given field does not provide values.") 
+
+    if method == "dist":
+        # normalize to 1 and add weights of the cosinus weighted sum
+        weights = w_dist / w_dist.sum() * np.cos(np.deg2rad(cell_lat))
+    elif method == "nn":
+        # chose maximum from weighting distances
+        i = np.argmax(w_dist)
+        ind, weights = [d_ind[i:i+1] for d_ind in ind], np.ones(1)
+
+    return SiteWeights(lon=lon, lat=lat, dims=dims, ind=ind, weights=weights,
+                       coords=coords, method=method, radius_km=radius_km)
+
+def _gather_cells(field, dims, ind):
+    """
+    Returns the time series of the given grid cells of the field along a new dimension "cell" (pointwise indexing).
+    Helper function for the space operators.
+
+    Parameters
+    ------------------------------
+    :field:      xarray DataArray
+    :dims:       list of the horizontal dimensions of the field
+    :ind:        index arrays of the grid cells, one per dimension in dims
+    """
+    cells = field.isel({d: xr.DataArray(d_ind, dims="cell") for d, d_ind in zip(dims, ind)})
+    return cells.drop_vars([c for c in cells.coords if "cell" in cells[c].dims])
+
+def _valid_cells(field, dims, ind, land_mask=None, nan_check_steps=None):
+    """
+    Returns a boolean array which is True for the given grid cells that are not nan at any point of the other dimensions (e.g. time),
+    or that are not masked by the land mask if provided. The nan check is a lazy reduction, so dask-backed fields are not 
+    loaded into memory at once. Helper function for the space operators.
+
+    Parameters
+    ------------------------------
+    :field:            xarray DataArray
+    :dims:             list of the horizontal dimensions of the field
+    :ind:              index arrays of the grid cells, one per dimension in dims
+    :land_mask:        xarray DataArray on the grid of the field, True (or 1) for grid cells to be ignored. Default is None.
+    :nan_check_steps:  integer; number of time steps used for the nan check. Default is None (entire time axis).
+    """
+    if land_mask is not None:
+        land_mask, _ = _prepare_field(land_mask)
+        _check_grid(land_mask, field["lon"].values, field["lat"].values)
+        return ~_gather_cells(land_mask, dims, ind).values.astype(bool)
+    
+    cells = _gather_cells(field, dims, ind)
+    if nan_check_steps is not None and "time" in cells.dims:
+        cells = cells.isel(time=slice(0, nan_check_steps))
+    return cells.notnull().all([d for d in cells.dims if d != "cell"]).values
+
+def _candidate_cells(lon, lat, grid_lon, grid_lat, x, y, radius_m, grid_index=None):
+    """
+    Returns the flat indices of the grid cells within the radius around a site at (x, y), in the order of the grid, 
+    and their weighting distances (radius - distance) in meters. Uses the spatial index if provided, 
+    else the lon-lat search box of regular grids. Helper function for the space operators.
+
+    Parameters
+    ------------------------------
+    :lon:        xarray DataArray of longitudes
+    :lat:        xarray DataArray of latitudes
+    :grid_lon:   array of longitudes of all grid cell centers (shape of the grid)
+    :grid_lat:   array of latitudes of all grid cell centers (shape of the grid)
+    :x:          float; longitude of the site
+    :y:          float; latitude of the site
+    :radius_m:   float; radius in meters within which grid cell centers should be considered
+    :grid_index: GridIndex object or None
+    """
+    if grid_index is None:
+        # grid cells in the search box
+        lon_min, lon_max, lat_min, lat_max = _search_box(lon, lat, x, y, radius_m)
+        in_box = (grid_lon >= lon_min) & (grid_lon <= lon_max) & (grid_lat >= lat_min) & (grid_lat <= lat_max)
+        flat_ind = np.flatnonzero(in_box)
+        w_dist = radius_m - _great_circle_m(grid_lon.ravel()[flat_ind], grid_lat.ravel()[flat_ind], x, y)
+    else:
+        flat_ind, dist = grid_index.query_radius(x, y, radius_m*1e-3)
+        w_dist = radius_m - dist
+    # radius check
+    return flat_ind[w_dist >= 0], w_dist[w_dist >= 0]
+
+def _plot_mask(field, dims, ind, w_dist, method):
+    """
+    Plots the weighting mask of a site as diagnostic plot.
+    Helper function for cupsm.create_site_weights().
+
+    Parameters
+    ------------------------------
+    :field:      xarray DataArray
+    :dims:       list of the horizontal dimensions of the field
+    :ind:        index arrays of the valid grid cells within the radius, one per dimension in dims
+    :w_dist:     array of weighting distances of these grid cells in meters
+    :method:     string; interpolation method, "dist" or "nn"
+    """
+    mask = np.full([field.sizes[d] for d in dims], np.nan)
+    mask[tuple(ind)] = w_dist / w_dist.sum() # normalize to 1
+    if method == "nn":
+        # set max to one and rest to nan
+        mask = np.where(mask == np.nanmax(mask), 1, np.nan)
+    mask = xr.DataArray(mask, dims=dims, coords={"lon": field["lon"], "lat": field["lat"]}, name="weighting [0-1]")
+
+    if mask.ndim == 2:
+        mask.plot(x="lon", y="lat")
+    else:
+        mask.to_dataset().plot.scatter(x="lon", y="lat", hue="weighting [0-1]")
+
+def _apply_weight_matrix(cells, rows, cols, weights, shape, backend):
+    """
+    Applies the (site x cell) weight matrix given by its non-zero entries to the gathered grid cells.
+    Returns an xarray DataArray in which the dimension "cell" is replaced by the dimension "site".
+    Helper function for cupsm.fields2sites().
+
+    Parameters
+    ------------------------------
+    :cells:      xarray DataArray with dimension "cell" (see _gather_cells)
+    :rows:       array of site indices of the non-zero weights
+    :cols:       array of cell indices of the non-zero weights
+    :weights:    array of the non-zero weights
+    :shape:      tuple; shape of the weight matrix (number of sites, number of cells)
+    :backend:    string; "dense" (numpy array) or "sparse" (scipy.sparse CSR matrix)
+    """
+    if backend == "dense":
+        weight_matrix = np.zeros(shape)
+        weight_matrix[rows, cols] = weights
+        return xr.dot(cells, xr.DataArray(weight_matrix, dims=["site", "cell"]), dim="cell")
+
+    elif backend == "sparse":
+        try:
+            import scipy.sparse
+        except ImportError:
+            raise ImportError("The sparse backend requires scipy. Please install scipy or use backend='dense'.")
+        weight_matrix = scipy.sparse.csr_matrix((weights, (rows, cols)), shape=shape)
+
+        def sparse_matmul(values):
+            # (..., cell) -> (..., site), one sparse-dense product per (time) chunk
+            flat = values.reshape(-1, shape[1])
+            return (weight_matrix @ flat.T).T.reshape(values.shape[:-1] + (shape[0],))
+
+        if cells.chunks is not None:
+            # all cells of a time chunk in one block
+            cells = cells.chunk({"cell": -1})
+        return xr.apply_ufunc(sparse_matmul, cells, input_core_dims=[["cell"]], output_core_dims=[["site"]],
+                              dask="parallelized", output_dtypes=[float], dask_gufunc_kwargs={"output_sizes": {"site": shape[0]}})
@@ -2,8 +2,21 @@
 The code of this module comprises helper routines.
 """
 # define __all__ to allow clean import via wildcard *
-__all__ = ['do_to_180']
+__all__ = ['do_to_180', 'site_seed']
 
+# Further helper functions (excluded from ReadTheDocs documentation)
+#    - function "_great_circle_m"
+#    - function "_unit_vectors"
+#    - function "_seed_sequence"
+#    - function "_member_seed"
+
+# Imports
+import hashlib
+import numpy as np
+import xarray as xr
+
+# mean earth radius in meters (same value as used by geopy.distance.great_circle)
+_EARTH_RADIUS_M = 6371.009e3
 
 # ~~~~~~~~~~~~~~~~~~~~~~
 # MISC
@@ -33,3 +46,87 @@ def do_to_180(dataobject, lon_name = 'lon', quiet=True):
     dataobject = dataobject.sortby(lon_name)
     
     return dataobject
+
+def site_seed(seed, site_name):
+    """
+    Returns the numpy.random.SeedSequence of a site, spawned from seed with a key derived from the site name. The random 
+    streams of a site then only depend on the seed and the site name, not on the order in which sites are processed, so 
+    parallel runs (e.g. over sites in several processes) are bit-identical to serial runs. time2chron() uses it for the 
+    pairing of ensemble members, it can be passed as rng to the noise operators (e.g. white_noise(..., rng=site_seed(seed, 
+    site.site_name))).
+
+    Parameters:
+    ------------------------------
+    :seed:         integer or numpy.random.SeedSequence; seed of the run
+    :site_name:    string; name of the site
+    """
+    seed = _seed_sequence(seed)
+    key = int(hashlib.sha256(str(site_name).encode("utf-8")).hexdigest()[:16], 16)
+    return np.random.SeedSequence(seed.entropy, spawn_key=seed.spawn_key+(key,), pool_size=seed.pool_size)
+
+# ~~~~~~~~~~~~~~~~~~~~~~
+# GEO
+# ~~~~~~~~~~~~~~~~~~~~~~
+def _great_circle_m(lon, lat, x, y):
+    """
+    Returns the great circle distance in meters between the points (lon, lat) and the point (x, y).
+    Vectorized version of geopy.distance.great_circle, which gives identical results for single points.
+    
+    Parameters:
+    ------------------------------
+    :lon:   array-like (numpy or xarray) of longitudes in °E
+    :lat:   array-like (numpy or xarray) of latitudes in °N, must be broadcastable against lon
+    :x:     float; longitude of the reference point in °E
+    :y:     float; latitude of the reference point in °N
+    """
+    lat1, lng1 = np.deg2rad(lat), np.deg2rad(lon)
+    lat2, lng2 = np.deg2rad(y), np.deg2rad(x)
+
+    sin_lat1, cos_lat1 = np.sin(lat1), np.cos(lat1)
+    sin_lat2, cos_lat2 = np.sin(lat2), np.cos(lat2)
+
+    delta_lng = lng2 - lng1
+    cos_delta_lng, sin_delta_lng = np.cos(delta_lng), np.sin(delta_lng)
+
+    d = np.arctan2(np.sqrt((cos_lat2 * sin_delta_lng) ** 2 +
+                           (cos_lat1 * sin_lat2 - sin_lat1 * cos_lat2 * cos_delta_lng) ** 2),
+                   sin_lat1 * sin_lat2 + cos_lat1 * cos_lat2 * cos_delta_lng)
+
+    return _EARTH_RADIUS_M * d
+
+def _unit_vectors(lon, lat):
+    """
+    Returns the 3-D unit vectors (x, y, z) of the given points on the sphere, shape (..., 3).
+    Used by the spherical spatial indices cupsm.GridIndex and cupsm.SiteIndex.
+
+    Parameters
+    ------------------------------
+    :lon:        array of longitudes in °E
+    :lat:        array of latitudes in °N
+    """
+    lon, lat = np.deg2rad(lon), np.deg2rad(lat)
+    return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=-1)
+
+# ~~~~~~~~~~~~~~~~~~~~~~
+# RANDOM STREAMS
+# ~~~~~~~~~~~~~~~~~~~~~~
+def _seed_sequence(rng):
+    """
+    Returns the numpy.random.SeedSequence of the random streams for a seed (integer), a SeedSequence, a Generator (the 
+    entropy is drawn from it) or None (the entropy is drawn from the global numpy random state). 
+    Used by the noise operators, cupsm.site_seed() and cupsm.time2chron().
+    """
+    if isinstance(rng, np.random.SeedSequence):
+        return rng
+    if rng is None:
+        return np.random.SeedSequence(int(np.random.randint(0, 2**63, dtype=np.int64)))
+    if isinstance(rng, np.random.Generator):
+        return np.random.SeedSequence(int(rng.integers(0, 2**63)))
+    return np.random.SeedSequence(rng)
+
+def _member_seed(seed, k):
+    """
+    Returns the seed of the random stream of ensemble member k: the k-th child of seed, as spawned by 
+    numpy.random.SeedSequence.spawn() (without changing the spawn counter of seed). Used by the noise operators.
+    """
+    return np.random.SeedSequence(seed.entropy, spawn_key=seed.spawn_key+(k,), pool_size=seed.pool_size)
@@ -4,35 +4,81 @@ It contains:
 
 - obs_data object creator function "get_records_df" 
 - Overview table creator function "create_proxy_info"
+- Overview table loader function "load_proxy_info"
+- Spatial index over the proxy sites "SiteIndex"
+- Native LiPD file reader "read_lpd"
 
 """
 # Further helper functions and classes (excluded from ReadTheDocs documentation)
 # - Table creator function helper
-#    - function "_empty_lipd_dict"
+#    - function "_read_proxy_info"
+#    - function "_read_proxy_infos"
+#    - function "_file_info"
+#    - function "_unchanged_files"
+# - Table file format helper
+#    - function "_table_format"
+#    - function "_import_pyarrow"
+#    - function "_write_proxy_table"
+#    - function "_dataset_columns"
+#    - function "_arrow_filter"
+#    - function "_pandas_filter"
+#    - function "_selection_filters"
+# - Spatial index helper
+#    - function "_site_index_file"
+#    - function "_in_polygon"
+# - Record loading helper
+#    - function "_read_record"
+#    - function "_read_lipd_file"
+# - Native LiPD reader helper
+#    - function "_decode"
+#    - function "_lpd_table"
+#    - function "_lpd_columns"
+#    - function "_read_csv_columns"
+#    - function "_rm_empty"
+# - On-disk cache of record data
+#    - function "_cache_load"
+#    - function "_cache_save"
 #    - class "_Suppressor" 
 
 # Imports
 from .utilities import *
-from .site_object import lipd2object
+from .site_object import lipd2object, compact_site
+from .utilities import _great_circle_m, _unit_vectors, _EARTH_RADIUS_M
 import os
 import numpy as np
 import pandas as pd
 import lipd
 import sys, traceback
+import hashlib
+import json
+import io
+import csv
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+# columns of the overview table which are no data set availability flags
+_META_COLUMNS = ["path", "file", "archive", "lon", "lat", "elevation", "age_min", "age_max", "agemodel", 
+                 "file_size", "file_mtime", "file_hash"]
+
+# format version of the on-disk cache of record data
+_CACHE_VERSION = 1
 
 # ~~~~~~~~~~~~~~~~~~~~~~
 # LiPD file handling
 # ~~~~~~~~~~~~~~~~~~~~~~
 
 def get_records_df(df, file_name=None, site_name=None, location=None, loc_radius=None,
-                desired_data=None, return_as="list"):
+                desired_data=None, return_as="list", radius_km=None, k_nearest=None, polygon=None, site_index=None,
+                lazy=False, workers=1, reader="lipd", cache_dir=None, compact=False):
     """
     Based on the overview table (created by the function create_proxy_info) LiPD proxy record files are selected, parsed, and returned as class objects "site_object". 
     If multiple files match the selection criteria, a list or a dictionary can be returned as "obs_data".
 
     Parameters:
     ------------------------------
-    :df:            pandas DataFrame; the proxy overview table created by the function create_proxy_info
+    :df:            pandas DataFrame; the proxy overview table created by the function create_proxy_info, or string; path and 
+                    file name of the saved overview table. For Parquet and Feather files, only the rows and columns needed for 
+                    the selection are loaded.
     :file_name:     string or list of strings; name(s) of the LiPD file without directory path (e.g. "XXXX.lipd")
     :site_name:     string or list of strings; name(s) of the proxy record site (e.g. "MD88_770")
                     -> detects only first hit
@@ -46,30 +92,65 @@ def get_records_df(df, file_name=None, site_name=None, location=None, loc_radius
                     Searches all files listed in the overview table
     :return_as:     string; either "list" or "dictionary". Determines whether an unsorted list of proxy record objects are returned or
                     a dictionary with record names as keys for the respective objects.
+    :radius_km:     float; selects the records within a great circle distance in km around location (lon and lat, elevation 
+                    is ignored), instead of the location interval given by loc_radius. Uses the spatial index (requires scipy).
+    :k_nearest:     integer; selects the k records closest to location (lon and lat, elevation is ignored). Can be combined with
+                    radius_km. Uses the spatial index (requires scipy).
+    :polygon:       list of (lon, lat) tuples; selects the records inside the polygon, given in degrees East and North. 
+                    Used instead of location. Uses the spatial index (requires scipy).
+    :site_index:    cupsm.SiteIndex; spatial index of the overview table. Default is None (loaded from the file saved alongside
+                    the overview table if df is a file name and the index file exists, otherwise built from df).
+    :lazy:          boolean; if True the record objects are returned without reading the LiPD files. Each file is read on first
+                    access of its data (see lipd2object.lazy), site name, coordinates and archive type are taken from the 
+                    overview table. Default is False.
+    :workers:       integer; number of processes reading the LiPD files in parallel (if lazy is False). Default is 1 
+                    (no parallelization). Each process imports the lipd package and the record objects (including the LiPD
+                    dictionaries) are pickled back to the main process, so parallel loading only pays off for many or 
+                    large files.
+    :reader:        string; "lipd" (read LiPD files with the lipd package) or "native" (faster, see cupsm.read_lpd()). 
+                    Default is "lipd".
+    :cache_dir:     string; directory of an on-disk cache for the age model and proxy data of the records (see 
+                    lipd2object.cache_dir). The cache is keyed by the content hash of the LiPD files. Together with lazy=True, 
+                    cached records are loaded from the cache without reading the LiPD files. Default is None (no cache).
+    :compact:       boolean; if True, compact record objects (cupsm.compact_site) are returned, which keep the age model and 
+                    age and depth axes as numpy arrays and release the LiPD dictionary. Can not be combined with lazy. 
+                    Default is False.
     """
 
     # --------------------
     # Internal Helpers
     # --------------------
     
+    def lazy_object(fpath, fname):
+        # record object with meta data from the overview table
+        row = df.iloc[file_rows[fname]]
+        return class_creator.lazy(path=fpath, file_name=fname, reader=reader, site_name=row.name, 
+                                  coords=[row["lon"], row["lat"], row["elevation"]], 
+                                  archive_type=row["archive"] if "archive" in row.index else None, cache_dir=cache_dir,
+                                  file_hash=row["file_hash"] if "file_hash" in row.index else None)
+    
     def check_read_return_single(fpath,fname):
         if os.path.isfile(fpath+fname):
-            with _Suppressor():
-                proxy_object = class_creator(lipd.readLipd(fpath+fname), path=fpath, file_name=fname)
-            return proxy_object
+            if lazy:
+                return lazy_object(fpath, fname)
+            return _read_record(fpath, fname, reader, cache_dir, compact)
         else:
             raise FileNotFoundError(f"The provided file {fname} is not found at {fpath}. Is your proxy info table up-to-date?")
 
     def collect_check_return(files, paths):
-        # collect and load files
-        record_object_list = []
+        # check files
         for i,file in enumerate(files):
-            if os.path.isfile(paths[i]+file):
-                with _Suppressor():
-                    temp_lipd=lipd.readLipd(paths[i]+file)
-                record_object_list.append(class_creator(temp_lipd, path=paths[i], file_name=file))
-            else:
-                raise FileNotFoundError(f"The provided file {fname} is not found at {fpath}. Is your proxy info table up-to-date?")
+            if not os.path.isfile(paths[i]+file):
+                raise FileNotFoundError(f"The provided file {file} is not found at {paths[i]}. Is your proxy info table up-to-date?")
+        # collect and load files
+        if lazy:
+            record_object_list = [lazy_object(paths[i], file) for i,file in enumerate(files)]
+        elif workers is not None and workers > 1 and len(files) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                record_object_list = list(executor.map(_read_record, list(paths), list(files), [reader]*len(files), 
+                                                       [cache_dir]*len(files), [compact]*len(files)))
+        else:
+            record_object_list = [_read_record(paths[i], file, reader, cache_dir, compact) for i,file in enumerate(files)]
         print(f"I return a {return_as} with {len(record_object_list)} record objects at {location} +/- {loc_radius}.")
         
         # return as list or dictionary:
@@ -98,7 +179,7 @@ def get_records_df(df, file_name=None, site_name=None, location=None, loc_radius
                 dx, dy, dz = loc_r
             elif len(location) == 2:
                 dx, dy = loc_r
-                dz = np.infty
+                dz = np.inf
             else:
                 raise ValueError("Please provide the loc radius as tuple, list or array.")
         else:
@@ -124,6 +205,18 @@ def get_records_df(df, file_name=None, site_name=None, location=None, loc_radius
         files = df.loc[mask]["file"].values
         paths = df.loc[mask]["path"].values
         return files, paths
+
+    # great circle radius, nearest neighbours and polygon via the spatial index
+    def query_index_return(index):
+        if polygon is not None:
+            sites = index.query_polygon(polygon)
+        elif k_nearest is not None:
+            sites = index.query_nearest(location[0], location[1], k=k_nearest)
+            if radius_km is not None:
+                sites = sites.loc[sites["distance_km"] <= radius_km]
+        else:
+            sites = index.query_radius(location[0], location[1], radius_km)
+        return sites["file"].values, sites["path"].values
     
     # -----
     # Main
@@ -131,8 +224,26 @@ def get_records_df(df, file_name=None, site_name=None, location=None, loc_radius
 
     if return_as not in ["list", "dictionary"]:
         raise ValueError("The keyword parameter return_as must be string, either 'list' or 'dictionary'.")
+    if lazy and compact:
+        raise ValueError("The keyword parameters lazy and compact can not be combined.")
     
     class_creator=lipd2object
+
+    if lazy:
+        # rows of the overview table by file name, for the meta data of lazy record objects
+        file_rows = {file: i for i, file in enumerate(df["file"])} if not isinstance(df, str) else None
+
+    spatial_query = polygon is not None or (location is not None and (radius_km is not None or k_nearest is not None))
+
+    # load the overview table partially
+    if isinstance(df, str):
+        if spatial_query and site_index is None and os.path.isfile(_site_index_file(df)):
+            site_index = SiteIndex.load(_site_index_file(df))
+        columns, filters, datasets = _selection_filters(file_name, site_name, None if spatial_query else location, 
+                                                        loc_radius, desired_data)
+        df = load_proxy_info(df, columns=columns, filters=filters, datasets=datasets)
+        if lazy:
+            file_rows = {file: i for i, file in enumerate(df["file"])}
     
     #if file name provided (assumed as unique)
     if file_name is not None:
@@ -192,9 +303,12 @@ def get_records_df(df, file_name=None, site_name=None, location=None, loc_radius
             raise KeyError(f"The site name {site_name} is not available. Please check the indeces of your dataframe.")
         
     # if location is provided
-    elif location is not None:
+    elif location is not None or polygon is not None:
         # select files which have the correct location
-        loc_files, loc_paths = mask_location_return(loc=location,loc_r=loc_radius)
+        if spatial_query:
+            loc_files, loc_paths = query_index_return(site_index if site_index is not None else SiteIndex(df))
+        else:
+            loc_files, loc_paths = mask_location_return(loc=location,loc_r=loc_radius)
         if desired_data is None:
             return collect_check_return(loc_files, loc_paths)
         else:
@@ -216,25 +330,39 @@ def get_records_df(df, file_name=None, site_name=None, location=None, loc_radius
     else:
         raise TypeError(f"ABORTED: No record information provided.")
 
-def create_proxy_info(database_path, save_path=None, file_name=".proxy_meta_data.pkl", update=False):
+def create_proxy_info(database_path, save_path=None, file_name=".proxy_meta_data.pkl", update=False, workers=1, site_index=False,
+                      reader="lipd"):
     """
     Creates or loads the proxy information table for a given database path. 
     If the overview table is already present, it is only loaded.
+    The table is saved as pickle (".pkl"), Parquet (".parquet") or Feather (".feather") file, depending on the file name. 
+    Parquet and Feather files store the data set availability as bitset and can be loaded partially with 
+    cupsm.load_proxy_info() (requires pyarrow).
+    LiPD files which cannot be read are reported and left out of the table. The table stores size, modification time 
+    and content hash of each LiPD file, so that an incremental update only reads new or changed files.
+    Optionally, a spatial index over the proxy sites (cupsm.SiteIndex) is saved alongside the table (same file name 
+    ending with ".sites.npz" instead), which is used by cupsm.get_records_df() and kept up to date on table updates.
 
     Parameters:
     ------------------------------
     :database_path:  string; path to directory where LiPD files are.
     :save_path:      string; path where the overview table should be stored. Default is database_path.
-    :file_name:      string; file name of the overview table
-    :update:         boolean; default is False (load table if it already exists), if True the overview table is 
-                     recreated for given paths
+    :file_name:      string; file name of the overview table, ending with ".pkl", ".parquet" or ".feather"
+    :update:         boolean or string; default is False (load table if it already exists), if True the overview table is 
+                     recreated for given paths. If "incremental", only new or changed LiPD files are read and rows of 
+                     deleted files are removed from an existing table.
+    :workers:        integer; number of processes reading the LiPD files in parallel. Default is 1 (no parallelization).
+                     Each process imports the lipd package (only the meta data is sent back to the main process), so 
+                     parallel reading only pays off for many or large files.
+    :site_index:     boolean; if True the spatial index is saved alongside the table. Default is False (an existing index file
+                     is still updated).
+    :reader:         string; "lipd" (read LiPD files with the lipd package) or "native" (faster, see cupsm.read_lpd()). 
+                     Default is "lipd".
     """
-    # set class creator
-    class_creator=lipd2object
-
-    # check file name
-    if not file_name.endswith(".pkl"):
-        raise ValueError("The overview table is saved in as pickle file. The file name must end with '.pkl'.")
+    # check file name and update keyword
+    if update not in [False, True, "incremental"]:
+        raise ValueError("The keyword parameter update must be either False, True or 'incremental'.")
+    _table_format(file_name)
         
     # set default save_path
     if save_path is None:
@@ -243,66 +371,835 @@ def create_proxy_info(database_path, save_path=None, file_name=".proxy_meta_data
     # check if file is already present:
     if os.path.isfile(save_path+file_name) and update == False:
         print(f"The {file_name} file is already present in {save_path} and is returned.")
-        print("For updating the file, run with the update=True")
-        return pd.read_pickle(save_path+file_name) 
+        print("For updating the file, run with the update=True or update='incremental'")
+        proxy_df = load_proxy_info(save_path+file_name)
+        if site_index and not os.path.isfile(_site_index_file(save_path+file_name)):
+            SiteIndex(proxy_df).save(_site_index_file(save_path+file_name))
+        return proxy_df
     #-----
     else:
-        # create the colums for the dummy array with an example file
-        example_file = [f for f in os.listdir(database_path) if ".lpd" in f][0]
-        with _Suppressor():
-            example_object = class_creator(lipd.readLipd(database_path+example_file), path=database_path,
-                                           file_name=example_file)
-        cols = list(example_object.info(meta=True).keys())
-
-        # create the empty dataframe and list for indexing
-        empty, N = _empty_lipd_dict(database_path, cols=cols, returnN=True)
-        index = [np.nan for i in range(N)]
-        # transform into dataframe
-        empty_df = pd.DataFrame(empty)
-        # iterate trhough lipd files
-        for ind,file in enumerate(os.listdir(database_path)): 
-            if not ".lpd" in file: continue
-            # create class object
-            with _Suppressor():
-                object = class_creator(lipd.readLipd(database_path+file), path=database_path,file_name=file)
-            index[ind] = object.site_name
-            proxy_dict = object.info(meta=True)
-            empty_df.update(pd.DataFrame(proxy_dict, index=[ind]))
+        files = [file for file in os.listdir(database_path) if ".lpd" in file]
+        
+        # for an incremental update, keep the rows of unchanged files
+        old_df = None
+        if update == "incremental" and os.path.isfile(save_path+file_name):
+            old_df = load_proxy_info(save_path+file_name)
+            if not {"file_size", "file_mtime", "file_hash"} <= set(old_df.columns):
+                print(f"The {file_name} file contains no file information (created with an older version) and is recreated.")
+                old_df = None
+        if old_df is not None:
+            old_df, read_files = _unchanged_files(old_df, database_path, files)
+        else:
+            read_files = files
+        
+        # read the meta data of the lipd files
+        results = _read_proxy_infos(database_path, read_files, workers=workers, reader=reader)
+        
+        # report files which could not be read
+        errors = [(file, error) for file, site_name, proxy_dict, error in results if error is not None]
+        if len(errors) > 0:
+            print(f"{len(errors)} of {len(read_files)} LiPD files could not be read and are not included in the overview table:")
+            for file, error in errors:
+                print(f"   {file}: {error}")
+
+        # create the dataframe in one go
+        records = [(site_name, proxy_dict) for file, site_name, proxy_dict, error in results if error is None]
+        proxy_df = pd.DataFrame([proxy_dict for site_name, proxy_dict in records], 
+                                index=[site_name for site_name, proxy_dict in records])
+        
+        if old_df is not None:
+            print(f"Incremental update: {len(read_files)} new or changed LiPD files read, {len(old_df)} unchanged.")
+            proxy_df = pd.concat([old_df, proxy_df]) if len(proxy_df) > 0 else old_df
+            # order of the directory listing
+            order = {file: i for i, file in enumerate(files)}
+            proxy_df = proxy_df.iloc[np.argsort([order[file] for file in proxy_df["file"]], kind="stable")]
         
-        empty_df.index = index
         # write to file
-        empty_df.to_pickle(save_path+file_name)
-        return empty_df
+        _write_proxy_table(proxy_df, save_path+file_name)
+        if site_index or os.path.isfile(_site_index_file(save_path+file_name)):
+            SiteIndex(proxy_df).save(_site_index_file(save_path+file_name))
+        return proxy_df
+
+def load_proxy_info(file, columns=None, filters=None, datasets=None):
+    """
+    Loads the proxy information table (created by the function create_proxy_info) from a pickle, Parquet or Feather file.
+    For Parquet and Feather files, only the requested columns are read and the rows are filtered while reading, without 
+    loading the whole table (requires pyarrow). Returns a pandas DataFrame with the site names as index.
+
+    Parameters:
+    ------------------------------
+    :file:          string; path and file name of the overview table
+    :columns:       list of strings; columns to load, can contain data set names (e.g. 'surface.temp'). Default is None (all columns).
+    :filters:       list of tuples (column, operator, value); only rows matching all conditions are loaded. Available operators 
+                    are "==", "!=", "<", "<=", ">", ">=" and "in". The site names can be filtered with the column "site_name",
+                    e.g. [("lon", ">=", 20), ("site_name", "in", ["MD88_770"])]. Default is None.
+    :datasets:      list of strings; only rows of records which provide all of these data sets are loaded. Default is None.
+    """
+    table_format = _table_format(file)
+    
+    # pickle files are loaded completely
+    if table_format == "pickle":
+        df = pd.read_pickle(file)
+        mask = _pandas_filter(df, filters)
+        for name in datasets or []:
+            if name not in df.columns:
+                raise KeyError(f"The data set {name} is not available. Please check the keys of your dataframe.")
+            mask &= (df[name]==True).values
+        df = df.loc[mask]
+        return df if columns is None else df[list(columns)]
+
+    # parquet and feather files are read with pyarrow
+    pa, pads, pc = _import_pyarrow()
+    dataset = pads.dataset(file, format="parquet" if table_format == "parquet" else "ipc")
+    names = json.loads(dataset.schema.metadata[b"cupsm.datasets"])
+    regular = [name for name in dataset.schema.names if name != "site_name" and not name.startswith("datasets_")]
+    
+    # columns to read
+    if columns is None:
+        columns = json.loads(dataset.schema.metadata[b"cupsm.columns"])
+        load_datasets = names
+    else:
+        unknown = [c for c in columns if c not in regular and c not in names]
+        if len(unknown) > 0:
+            raise KeyError(f"The columns {unknown} are not available. Please check the keys of your dataframe.")
+        load_datasets = [c for c in columns if c in names]
+    read_columns = [c for c in columns if c in regular]
+    words = sorted({f"datasets_{names.index(name) // 64}" for name in load_datasets})
+    
+    table = dataset.to_table(columns=["site_name"] + read_columns + words, 
+                             filter=_arrow_filter(filters, datasets, names, pa, pads, pc))
+    df = table.select(["site_name"] + read_columns).to_pandas()
+    
+    # categorical encoded strings back to strings
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype(df[col].cat.categories.dtype)
+    
+    # decode data set availability
+    if len(load_datasets) > 0:
+        flags = {}
+        for name in load_datasets:
+            i = names.index(name)
+            word = table.column(f"datasets_{i // 64}").to_numpy()
+            flags[name] = ((word >> np.uint64(i % 64)) & np.uint64(1)).astype(bool)
+        df = pd.concat([df, pd.DataFrame(flags, index=df.index)], axis=1)
+    
+    df = df.set_index("site_name")[list(columns)]
+    df.index.name = None
+    return df
+
+# ~~~~~~~~~~~~~~~~~~~~~~
+# Spatial index
+# ~~~~~~~~~~~~~~~~~~~~~~
+class SiteIndex:
+    """
+    Spherical spatial index over the proxy sites of an overview table (KD-tree on 3-D unit vectors, requires scipy).
+    The index answers great circle radius, nearest neighbour and polygon queries without scanning the whole table. 
+    It can be saved alongside the overview table (see cupsm.create_proxy_info()) and handed over to cupsm.get_records_df() 
+    with the site_index keyword. Sites without valid coordinates are not indexed.
+
+    Attributes:
+    ------------------------------------
+    - files:        names of the LiPD files
+    - lat:          latitudes of the sites in °N
+    - lon:          longitudes of the sites in °E
+    - paths:        paths where the LiPD files are located
+    - site_names:   names of the record sites
+
+    Methods:
+    ------------------------------------
+    - query_nearest:    returns the k sites closest to a location
+    - query_polygon:    returns all sites inside a polygon
+    - query_radius:     returns all sites within a radius around a location
+    - save:             saves the index to a .npz file
+    - load:             loads an index saved with save (class method)
+    """
+    # Initialization
+    #-----------------
+
+    def __init__(self, df):
+        try:
+            from scipy.spatial import cKDTree
+        except ImportError:
+            raise ImportError("The site index requires scipy. Please install scipy.")
+
+        lon = np.asarray(df["lon"], dtype=float)
+        lat = np.asarray(df["lat"], dtype=float)
+        valid = np.isfinite(lon) & np.isfinite(lat)
+
+        self.site_names = np.asarray(df.index, dtype=str)[valid]
+        """ Names of the record sites """
+
+        self.files = np.asarray(df["file"], dtype=str)[valid]
+        """ Names of the LiPD files """
+
+        self.paths = np.asarray(df["path"], dtype=str)[valid]
+        """ Paths where the LiPD files are located """
+
+        self.lon = lon[valid]
+        """ Longitudes of the sites in °E """
+
+        self.lat = lat[valid]
+        """ Latitudes of the sites in °N """
+
+        self._tree = cKDTree(_unit_vectors(self.lon, self.lat).reshape(-1, 3))
+
+    # Functions
+    #-----------------
+
+    def query_nearest(self, x, y, k=1):
+        """
+        Returns the k sites closest to the location (x, y) as pandas DataFrame (index: site names, columns: file, path, lon, lat,
+        distance_km), sorted by great circle distance.
+
+        Parameters:
+        ------------------------------
+        :x:   float; longitude in °E
+        :y:   float; latitude in °N
+        :k:   integer; number of sites. Default is 1.
+        """
+        k = min(k, len(self.lon))
+        _, ind = self._tree.query(_unit_vectors(x, y), k=k)
+        ind = np.atleast_1d(ind)
+        return self._sites(ind, _great_circle_m(self.lon[ind], self.lat[ind], x, y) / 1e3)
+
+    def query_radius(self, x, y, radius_km):
+        """
+        Returns all sites within the great circle radius around the location (x, y) as pandas DataFrame (index: site names, 
+        columns: file, path, lon, lat, distance_km), sorted by distance.
+
+        Parameters:
+        ------------------------------
+        :x:           float; longitude in °E
+        :y:           float; latitude in °N
+        :radius_km:   float; radius in km
+        """
+        radius_m = radius_km*1e3
+        # great circle distance -> chord length on the unit sphere (with a small tolerance, exact check below)
+        chord = 2 * np.sin(min(radius_m / (2 * _EARTH_RADIUS_M), np.pi / 2)) * (1 + 1e-9)
+        ind = np.asarray(self._tree.query_ball_point(_unit_vectors(x, y), chord), dtype=int)
+        dist = _great_circle_m(self.lon[ind], self.lat[ind], x, y)
+        ind, dist = ind[dist <= radius_m], dist[dist <= radius_m]
+        order = np.argsort(dist, kind="stable")
+        return self._sites(ind[order], dist[order] / 1e3)
+
+    def query_polygon(self, polygon):
+        """
+        Returns all sites inside the polygon as pandas DataFrame (index: site names, columns: file, path, lon, lat), in the 
+        order of the overview table. The polygon edges are straight lines in longitude-latitude space.
+
+        Parameters:
+        ------------------------------
+        :polygon:   list of (lon, lat) tuples; vertices of the polygon in °E and °N
+        """
+        vertices = np.asarray(polygon, dtype=float)
+        if vertices.ndim != 2 or vertices.shape[0] < 3 or vertices.shape[1] != 2:
+            raise ValueError("Please provide the polygon as list of at least three (lon, lat) tuples.")
+        # preselection by the bounding box
+        (x_min, y_min), (x_max, y_max) = vertices.min(axis=0), vertices.max(axis=0)
+        ind = np.flatnonzero((self.lon >= x_min) & (self.lon <= x_max) & (self.lat >= y_min) & (self.lat <= y_max))
+        ind = ind[_in_polygon(self.lon[ind], self.lat[ind], vertices)]
+        return self._sites(ind)
+
+    def save(self, file):
+        """
+        Saves the index to a .npz file. The index can be recreated with SiteIndex.load(file).
+
+        Parameters:
+        ------------------------------
+        :file:	string; path and file name, should end with ".npz".
+        """
+        np.savez(file, site_names=self.site_names, files=self.files, paths=self.paths, lon=self.lon, lat=self.lat)
+
+    @classmethod
+    def load(cls, file):
+        """
+        Loads an index which was saved with SiteIndex.save(). Returns a SiteIndex object.
+
+        Parameters:
+        ------------------------------
+        :file:	string; path and file name of the .npz file.
+        """
+        with np.load(file) as data:
+            df = pd.DataFrame({"file": data["files"], "path": data["paths"], "lon": data["lon"], "lat": data["lat"]},
+                              index=data["site_names"])
+        return cls(df)
+
+    def _sites(self, ind, distance_km=None):
+        """
+        Returns the sites at the given positions as pandas DataFrame.
+        """
+        sites = pd.DataFrame({"file": self.files[ind], "path": self.paths[ind], "lon": self.lon[ind], "lat": self.lat[ind]},
+                             index=self.site_names[ind])
+        if distance_km is not None:
+            sites["distance_km"] = distance_km
+        return sites
+
+# ~~~~~~~~~~~~~~~~~~~~~~
+# Native LiPD reader
+# ~~~~~~~~~~~~~~~~~~~~~~
+def read_lpd(file):
+    """
+    Reads a LiPD file directly from the .lpd (zip) archive, without the lipd package, and returns the parts of the LiPD 
+    dictionary which are used by cupsm (see cupsm.lipd2object): "dataSetName", "archiveType", "geo", the first measurement 
+    table "paleo0measurement0" and the first ensemble table "chron0model0ensemble0". The structure and column names are the 
+    same as returned by lipd.readLipd. Numeric columns are returned as float64 numpy arrays (missing values as nan), the 
+    ensemble table is read into a single float64 array.
+
+    Notes:
+    ------------------------------
+    --> Statistics which lipd.readLipd infers from the data (e.g. "hasMinValue", "hasResolution") and generated TSids are not added.
+    --> LiPD files older than version 1.3 are read with lipd.readLipd.
+
+    Parameters:
+    ------------------------------
+    :file:  string; path and file name of the LiPD file
+    """
+    with zipfile.ZipFile(file) as archive:
+        names = archive.namelist()
+        jsonld = [name for name in names if name.endswith(".jsonld")]
+        if len(jsonld) == 0:
+            raise ValueError(f"No metadata (.jsonld) found in the LiPD file {file}.")
+        metadata = json.loads(_decode(archive.read(jsonld[0])))
+        
+        # older versions are updated by the lipd package
+        if str(metadata.get("lipdVersion", "1.0")) not in ["1.3"]:
+            with _Suppressor():
+                return lipd.readLipd(file)
+        
+        def read_csv(table):
+            # csv files are stored next to the jsonld file
+            csv_file = os.path.dirname(jsonld[0]) + "/" + table["filename"]
+            return _decode(archive.read(csv_file))
+        
+        lipd_dict = {"dataSetName": metadata.get("dataSetName", os.path.splitext(os.path.basename(file))[0])}
+        for key in ["archiveType", "geo", "lipdVersion"]:
+            if key in metadata:
+                lipd_dict[key] = _rm_empty(metadata[key])
+
+        # first measurement table
+        if "paleoData" in metadata:
+            table = _lpd_table(metadata["paleoData"], "measurementTable")
+            lipd_dict["paleoData"] = {"paleo0": {}}
+            if table is not None:
+                lipd_dict["paleoData"]["paleo0"]["measurementTable"] = {
+                    "paleo0measurement0": _lpd_columns(table, read_csv(table), "paleo0measurement0")}
+        
+        # first ensemble table
+        if "chronData" in metadata:
+            lipd_dict["chronData"] = {"chron0": {}}
+            models = metadata["chronData"][0].get("model", []) if len(metadata["chronData"]) > 0 else []
+            table = _lpd_table(models, "ensembleTable")
+            if table is not None:
+                lipd_dict["chronData"]["chron0"]["model"] = {"chron0model0": {"ensembleTable": {
+                    "chron0model0ensemble0": _lpd_columns(table, read_csv(table), "chron0model0ensemble0")}}}
+    return lipd_dict
 
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # Helper functions and classes
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
-def _empty_lipd_dict(database_path, cols=None, returnN=False):
+def _read_proxy_info(database_path, file, reader="lipd"):
+    """
+    Reads a LiPD file and returns the tuple (file, site name, meta data dictionary, error). If the file cannot be read, 
+    site name and meta data dictionary are None and error contains the error message, otherwise error is None.
+    Runs in the worker processes of cupsm.create_proxy_info().
+
+    Parameters:
+    ----------
+    database_path:   string; path to directory where LiPD files are.
+    file:            string; name of the LiPD file
+    reader:          string; "lipd" or "native". Default is "lipd".
+    """
+    try:
+        proxy_object = _read_record(database_path, file, reader)
+        proxy_dict = proxy_object.info(meta=True)
+        proxy_dict.update(_file_info(database_path, file))
+        return file, proxy_object.site_name, proxy_dict, None
+    except Exception as e:
+        return file, None, None, f"{type(e).__name__}: {e}"
+
+def _read_proxy_infos(database_path, files, workers=1, reader="lipd"):
+    """
+    Reads the meta data of the given LiPD files with cupsm._read_proxy_info(), in parallel if workers > 1. 
+    Returns a list of the results in the order of files.
+
+    Parameters:
+    ----------
+    database_path:   string; path to directory where LiPD files are.
+    files:           list of strings; names of the LiPD files
+    workers:         integer; number of processes, default is 1
+    reader:          string; "lipd" or "native". Default is "lipd".
+    """
+    if workers is None or workers <= 1 or len(files) <= 1:
+        return [_read_proxy_info(database_path, file, reader) for file in files]
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunksize = max(1, len(files) // (4*workers))
+        return list(executor.map(_read_proxy_info, [database_path]*len(files), files, [reader]*len(files), 
+                                 chunksize=chunksize))
+
+def _file_info(database_path, file, stat_only=False):
     """
-    Creates an empty dictionary as base for the the proxy overview table.
+    Returns size (bytes), modification time and content hash (sha256) of a file as dictionary with the keys 
+    "file_size", "file_mtime" and "file_hash". Used to detect changed LiPD files in cupsm.create_proxy_info().
 
     Parameters:
     ----------
     database_path:   string; path to directory where LiPD files are.
-    cols:            list of strings; Column names of the resulting table, 
-                     default are ["file_name", "archive", "lon", "lat", "elevation", "age_min", "age_max"]
-    returnN:         boolean; default is False, if True, the number of LiPD files found is returned as well
-    """
-    # number of lipd files in path
-    N = len([file for file in os.listdir(database_path) if os.path.isfile(os.path.join(database_path, file)) and ".lpd" in file])
-    # array full of nan
-    a = [np.nan for i in range(N)]
-    # empty dictionary
-    empty = {}
-    if cols is None:
-        cols = ["file_name", "archive", "lon", "lat", "elevation", "age_min", "age_max"]
-    for col in cols:
-        empty[col] = a
-    if returnN:
-        return empty, N
+    file:            string; name of the LiPD file
+    stat_only:       boolean; default is False, if True the content hash is not computed
+    """
+    stat = os.stat(database_path+file)
+    info = {"file_size": stat.st_size, "file_mtime": stat.st_mtime}
+    if not stat_only:
+        file_hash = hashlib.sha256()
+        with open(database_path+file, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                file_hash.update(block)
+        info["file_hash"] = file_hash.hexdigest()
+    return info
+
+def _unchanged_files(old_df, database_path, files):
+    """
+    Compares an existing overview table with the LiPD files in the database. Returns the rows of unchanged files and the 
+    list of files which are new or changed. A file is unchanged if size and modification time are unchanged, or, if only 
+    the modification time changed, if the content hash is unchanged. Rows of deleted files are dropped.
+
+    Parameters:
+    ----------
+    old_df:          pandas DataFrame; existing overview table with the columns "file_size", "file_mtime" and "file_hash"
+    database_path:   string; path to directory where LiPD files are.
+    files:           list of strings; names of the LiPD files in the database
+    """
+    old_rows = {file: i for i, file in enumerate(old_df["file"])}
+    keep, read_files = [], []
+    mtime = old_df["file_mtime"].values.copy()
+    for file in files:
+        if file not in old_rows:
+            read_files.append(file)
+            continue
+        i = old_rows[file]
+        info = _file_info(database_path, file, stat_only=True)
+        if info["file_size"] != old_df["file_size"].iloc[i]:
+            read_files.append(file)
+        elif info["file_mtime"] == mtime[i]:
+            keep.append(i)
+        elif _file_info(database_path, file)["file_hash"] == old_df["file_hash"].iloc[i]:
+            # touched but not changed
+            mtime[i] = info["file_mtime"]
+            keep.append(i)
+        else:
+            read_files.append(file)
+    old_df = old_df.assign(file_mtime=mtime).iloc[keep]
+    return old_df, read_files
+
+def _table_format(file):
+    """
+    Returns the format of the overview table ("pickle", "parquet" or "feather") given by the file name ending.
+
+    Parameters:
+    ----------
+    file:            string; file name of the overview table
+    """
+    for ending, table_format in [(".pkl", "pickle"), (".parquet", "parquet"), (".feather", "feather")]:
+        if file.endswith(ending):
+            return table_format
+    raise ValueError("The overview table is saved as pickle, Parquet or Feather file. The file name must end with '.pkl', '.parquet' or '.feather'.")
+
+def _import_pyarrow():
+    """
+    Imports pyarrow, pyarrow.dataset and pyarrow.compute, required for Parquet and Feather overview tables.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.dataset as pads
+        import pyarrow.compute as pc
+    except ImportError:
+        raise ImportError("Parquet and Feather overview tables require pyarrow. Please install pyarrow or use a '.pkl' file name.")
+    return pa, pads, pc
+
+def _write_proxy_table(df, file):
+    """
+    Writes the overview table as pickle, Parquet or Feather file. For Parquet and Feather, the site names are stored in 
+    the column "site_name", strings are dictionary encoded and the data set availability flags are packed into the 
+    bitset columns "datasets_0", "datasets_1", ... (64 data sets each, bit i % 64 of column i // 64 for data set i), 
+    whose data set names are kept in the file metadata.
+
+    Parameters:
+    ----------
+    df:              pandas DataFrame; overview table
+    file:            string; path and file name of the overview table
+    """
+    table_format = _table_format(file)
+    if table_format == "pickle":
+        df.to_pickle(file)
+        return
+    pa, pads, pc = _import_pyarrow()
+    
+    # pack data set flags into 64 bit words
+    names = _dataset_columns(df)
+    flags = df[names].fillna(False).astype(bool).values
+    flags = np.pad(flags, ((0, 0), (0, -len(names) % 64)))
+    words = np.ascontiguousarray(np.packbits(flags, axis=1, bitorder="little")).view("<u8")
+    
+    # dictionary encoding of repeated strings
+    meta = df[[col for col in df.columns if col not in names]].copy()
+    for col in ["path", "archive"]:
+        if col in meta.columns:
+            meta[col] = meta[col].astype("category")
+    meta.insert(0, "site_name", df.index)
+    for i in range(words.shape[1]):
+        meta[f"datasets_{i}"] = words[:, i].astype(np.uint64)
+    
+    table = pa.Table.from_pandas(meta, preserve_index=False)
+    table = table.replace_schema_metadata({b"cupsm.datasets": json.dumps(names), 
+                                           b"cupsm.columns": json.dumps(list(df.columns))})
+    if table_format == "parquet":
+        import pyarrow.parquet as pq
+        pq.write_table(table, file)
     else:
-        return empty
+        import pyarrow.feather as feather
+        feather.write_feather(table, file)
+
+def _dataset_columns(df):
+    """
+    Returns the names of the data set availability columns of an overview table.
+
+    Parameters:
+    ----------
+    df:              pandas DataFrame; overview table
+    """
+    return [col for col in df.columns if col not in _META_COLUMNS]
+
+def _arrow_filter(filters, datasets, names, pa, pads, pc):
+    """
+    Converts the filters and data sets of cupsm.load_proxy_info() into a pyarrow.dataset expression (None for no filter).
+
+    Parameters:
+    ----------
+    filters:         list of tuples (column, operator, value) or None
+    datasets:        list of data set names or None
+    names:           list of the data set names in the bitset columns
+    pa, pads, pc:    pyarrow modules
+    """
+    expression = None
+    conditions = []
+    for column, operator, value in filters or []:
+        field = pads.field(column)
+        if operator == "in":
+            conditions.append(field.isin(list(value)))
+        elif operator in ["==", "!=", "<", "<=", ">", ">="]:
+            conditions.append({"==": field == value, "!=": field != value, "<": field < value, 
+                               "<=": field <= value, ">": field > value, ">=": field >= value}[operator])
+        else:
+            raise ValueError(f"The filter operator {operator} is not available.")
+    for name in datasets or []:
+        if name not in names:
+            raise KeyError(f"The data set {name} is not available. Please check the keys of your dataframe.")
+        i = names.index(name)
+        bit = pa.scalar(1 << (i % 64), pa.uint64())
+        conditions.append(pc.bit_wise_and(pads.field(f"datasets_{i // 64}"), bit) != pa.scalar(0, pa.uint64()))
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return expression
+
+def _pandas_filter(df, filters):
+    """
+    Evaluates the filters of cupsm.load_proxy_info() on an overview table in memory. Returns a boolean numpy.ndarray.
+
+    Parameters:
+    ----------
+    df:              pandas DataFrame; overview table
+    filters:         list of tuples (column, operator, value) or None
+    """
+    mask = np.ones(len(df), dtype=bool)
+    for column, operator, value in filters or []:
+        values = pd.Series(df.index, index=df.index) if column == "site_name" else df[column]
+        if operator == "in":
+            mask &= values.isin(list(value)).values
+        elif operator in ["==", "!=", "<", "<=", ">", ">="]:
+            mask &= {"==": values == value, "!=": values != value, "<": values < value, 
+                     "<=": values <= value, ">": values > value, ">=": values >= value}[operator].values
+        else:
+            raise ValueError(f"The filter operator {operator} is not available.")
+    return mask
+
+def _selection_filters(file_name, site_name, location, loc_radius, desired_data):
+    """
+    Returns columns, filters and data sets for cupsm.load_proxy_info() that preselect the rows which cupsm.get_records_df() 
+    can return for the given selection. The exact selection is done by cupsm.get_records_df() afterwards.
+
+    Parameters:
+    ----------
+    see cupsm.get_records_df()
+    """
+    columns = ["path", "file", "archive", "lon", "lat", "elevation"]
+    if file_name is not None:
+        names = [file_name] if isinstance(file_name, str) else list(file_name)
+        names = [name if str(name).endswith(".lpd") else f"{name}.lpd" for name in names]
+        return columns, [("file", "in", names)], None
+    if site_name is not None:
+        names = [site_name] if isinstance(site_name, str) else list(site_name)
+        return columns, [("site_name", "in", names)], None
+    
+    filters = []
+    if location is not None:
+        radius = loc_radius if loc_radius is not None else [0, 0, 0]
+        for col, value, r in zip(["lon", "lat", "elevation"], location, radius):
+            if value is True or not np.isscalar(value) or not np.isscalar(r):
+                continue
+            # slightly widened bounds, the exact comparison is done by get_records_df
+            margin = 1e-9 * (1 + abs(value) + abs(r))
+            filters += [(col, ">=", value - r - margin), (col, "<=", value + r + margin)]
+    if desired_data is not None:
+        return columns + [desired_data], filters, [desired_data]
+    return columns, filters, None
+
+def _site_index_file(file):
+    """
+    Returns the file name of the spatial index saved alongside an overview table (ending ".sites.npz" instead of the table format).
+
+    Parameters:
+    ----------
+    file:            string; path and file name of the overview table
+    """
+    return os.path.splitext(file)[0] + ".sites.npz"
+
+def _in_polygon(lon, lat, vertices):
+    """
+    Returns a boolean numpy.ndarray, True for the points (lon, lat) inside the polygon (even-odd rule, ray casting).
+    Helper function for cupsm.SiteIndex.query_polygon().
+
+    Parameters:
+    ----------
+    lon:             numpy.ndarray of longitudes
+    lat:             numpy.ndarray of latitudes
+    vertices:        numpy.ndarray (n x 2) of the polygon vertices (lon, lat)
+    """
+    inside = np.zeros(len(lon), dtype=bool)
+    for (x1, y1), (x2, y2) in zip(vertices, np.roll(vertices, 1, axis=0)):
+        crosses = (y1 > lat) != (y2 > lat)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x_cross = (x2 - x1) * (lat - y1) / (y2 - y1) + x1
+        inside ^= crosses & (lon < x_cross)
+    return inside
+
+def _read_record(path, file, reader="lipd", cache_dir=None, compact=False):
+    """
+    Reads a LiPD file and returns the record object (cupsm.lipd2object). Runs in the worker processes of cupsm.get_records_df().
+
+    Parameters:
+    ----------
+    path:            string; path where the LiPD file is located
+    file:            string; name of the LiPD file
+    reader:          string; "lipd" or "native". Default is "lipd".
+    cache_dir:       string; directory of the on-disk cache of the record data. Default is None (no cache).
+    compact:         boolean; if True, a compact record object (cupsm.compact_site) is returned. Default is False.
+    """
+    if compact:
+        return compact_site(_read_lipd_file(path+file, reader), path=path, file_name=file, reader=reader, cache_dir=cache_dir)
+    return lipd2object(_read_lipd_file(path+file, reader), path=path, file_name=file, cache_dir=cache_dir)
+
+def _read_lipd_file(file, reader="lipd"):
+    """
+    Reads a LiPD file with the lipd package (reader "lipd") or with cupsm.read_lpd() (reader "native") and returns the 
+    LiPD dictionary.
+
+    Parameters:
+    ----------
+    file:            string; path and file name of the LiPD file
+    reader:          string; "lipd" or "native". Default is "lipd".
+    """
+    if reader == "native":
+        return read_lpd(file)
+    elif reader == "lipd":
+        with _Suppressor():
+            return lipd.readLipd(file)
+    raise ValueError("The keyword parameter reader must be either 'lipd' or 'native'.")
+
+def _decode(content):
+    """
+    Decodes the content of a file in a LiPD archive (utf-8, with latin-1 as fallback like the lipd package).
+    Helper function for cupsm.read_lpd().
+    """
+    try:
+        return content.decode("utf-8")
+    except UnicodeDecodeError:
+        return content.decode("latin-1")
+
+def _lpd_table(sections, table_type):
+    """
+    Returns the first table of the given type (e.g. "measurementTable") in the first section of a LiPD metadata list, 
+    or None. Helper function for cupsm.read_lpd().
+
+    Parameters:
+    ----------
+    sections:        list of dictionaries; e.g. paleoData or the models of the first chronData entry
+    table_type:      string; e.g. "measurementTable" or "ensembleTable"
+    """
+    if not isinstance(sections, list):
+        raise ValueError("The LiPD metadata has an unknown structure.")
+    if len(sections) == 0 or table_type not in sections[0] or len(sections[0][table_type]) == 0:
+        return None
+    return sections[0][table_type][0]
+
+def _lpd_columns(table, csv_text, table_name):
+    """
+    Combines the column metadata of a LiPD table with the values from its csv file. Columns are named as by the lipd 
+    package: by variable name (duplicates get the suffix "-1", "-2", ...), ensemble columns referring to several csv 
+    columns are split into the columns "<variable name>-<column number>-ens". Helper function for cupsm.read_lpd().
+
+    Parameters:
+    ----------
+    table:           dictionary; table metadata from the jsonld file
+    csv_text:        string; content of the csv file of the table
+    table_name:      string; name of the table
+    """
+    csv_columns = _read_csv_columns(csv_text, table.get("missingValue", "nan"))
+    columns = {}
+    for column in table["columns"]:
+        column = {key: _rm_empty(value) for key, value in column.items() if key != "missingValue"}
+        column = {key: value for key, value in column.items() if value or value in [0, 0.0]}
+        name = column["variableName"]
+        if isinstance(column["number"], list):
+            # ensemble members
+            for number in column["number"]:
+                member = dict(column, number=number, variableName=f"{name}-{number}-ens", isEnsemble=True, ensembleName=name)
+                member["values"] = csv_columns[int(number) - 1]
+                columns[member["variableName"]] = member
+        else:
+            if name in columns:
+                # same as lipd's get_appended_name
+                for i in range(1, 11):
+                    if f"{name}-{i}" not in columns:
+                        name = f"{name}-{i}"
+                        break
+                else:
+                    name = f"{name}-99"
+            column["values"] = csv_columns[int(column["number"]) - 1]
+            columns[name] = column
+    return {"columns": columns, "filename": table.get("filename"), "tableName": table_name, "missingValue": "nan"}
+
+def _read_csv_columns(csv_text, missing_value="nan"):
+    """
+    Parses the csv file of a LiPD table into a list of columns. Columns with only numbers (or missing values) are returned 
+    as float64 numpy arrays (views of one array for purely numeric tables), other columns as lists of floats and strings 
+    (missing values as "nan") like the lipd package. Helper function for cupsm.read_lpd().
+
+    Parameters:
+    ----------
+    csv_text:        string; content of the csv file
+    missing_value:   missing value of the table (replaced by nan if the table contains nan or text, like the lipd package)
+    """
+    replace_missing = isinstance(missing_value, (int, float)) and not isinstance(missing_value, bool)
+    # fast path: numeric table
+    try:
+        values = np.loadtxt(io.StringIO(csv_text), delimiter=",", dtype=np.float64, ndmin=2)
+    except ValueError:
+        values = None
+    if values is not None:
+        if replace_missing and np.isnan(values).any():
+            values[values == missing_value] = np.nan
+        return [values[:, i] for i in range(values.shape[1])]
+
+    # cell by cell: numbers as float, text as string
+    empty = ['', ' ', None, 'na', 'n/a', '?', "'", "''"]
+    columns = []
+    for row in csv.reader(io.StringIO(csv_text), delimiter=","):
+        for i, cell in enumerate(row):
+            if i == len(columns):
+                columns.append([])
+            try:
+                columns[i].append(float(cell))
+            except ValueError:
+                columns[i].append(cell)
+    
+    # missing values are replaced by "nan" (only if the table contains nan or text, like the lipd package)
+    numeric = all(isinstance(v, float) and not np.isnan(v) for column in columns for v in column)
+    result = []
+    for column in columns:
+        if not numeric:
+            column = ["nan" if (v in empty or (replace_missing and v == missing_value) or 
+                                (isinstance(v, float) and np.isnan(v))) else v for v in column]
+        if all(isinstance(v, float) or v == "nan" for v in column):
+            column = np.array(column, dtype=np.float64)
+        result.append(column)
+    return result
+
+def _rm_empty(value):
+    """
+    Removes empty entries from (nested) metadata and strips trailing whitespace, like lipd's rm_empty_fields. 
+    Helper function for cupsm.read_lpd().
+    """
+    empty = ['', ' ', None, 'na', 'n/a', '?', "'", "''"]
+    if isinstance(value, str) or value is None:
+        value = value.rstrip() if value is not None else value
+        return '' if value in empty else value
+    if isinstance(value, list):
+        value = [_rm_empty(v) for v in value]
+        return [v for v in value if v or v in [0, 0.0]]
+    if isinstance(value, dict):
+        value = {k: _rm_empty(v) for k, v in value.items()}
+        return {k: v for k, v in value.items() if v or v in [0, 0.0]}
+    return value
+
+def _cache_load(cache_dir, key, part):
+    """
+    Loads a part of the record data ("chron" or "paleo") from the on-disk cache. Returns a dictionary of (writable, 
+    in-memory) arrays and the meta data, or None if the part is not cached. The arrays are not memory-mapped, so data from 
+    the cache behaves like freshly read data (e.g. for in-place changes) and no cache files are kept open. 
+    Helper function for cupsm.lipd2object.
+
+    Parameters:
+    ----------
+    cache_dir:       string; directory of the cache
+    key:             string; cache key of the record (content hash of the LiPD file)
+    part:            string; "chron" (age model) or "paleo" (proxy data)
+    """
+    folder = os.path.join(cache_dir, key)
+    try:
+        with open(os.path.join(folder, f"{part}.json"), "r") as f:
+            meta = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if meta.get("version") != _CACHE_VERSION:
+        return None
+    arrays = {}
+    for i, name in enumerate(meta["arrays"]):
+        file = os.path.join(folder, f"{part}_{i}.npy")
+        arrays[name] = np.load(file, allow_pickle=False)
+    return arrays, meta
+
+def _cache_save(cache_dir, key, part, arrays, meta):
+    """
+    Saves a part of the record data ("chron" or "paleo") in the on-disk cache: one .npy file per array and the meta data as
+    json file, which is written last. Files are written under a temporary name and renamed, so that parallel processes 
+    can share the cache. Parts with arrays of python objects are not cached. Helper function for cupsm.lipd2object.
+
+    Parameters:
+    ----------
+    cache_dir:       string; directory of the cache
+    key:             string; cache key of the record (content hash of the LiPD file)
+    part:            string; "chron" (age model) or "paleo" (proxy data)
+    arrays:          dictionary; name and numpy array
+    meta:            dictionary; json serializable meta data
+    """
+    if any(array.dtype.hasobject for array in arrays.values()):
+        return
+    folder = os.path.join(cache_dir, key)
+    os.makedirs(folder, exist_ok=True)
+    
+    def write(file, save):
+        temp_file = os.path.join(folder, f".{os.getpid()}.{file}")
+        with open(temp_file, "wb") as f:
+            save(f)
+        os.replace(temp_file, os.path.join(folder, file))
+    
+    for i, array in enumerate(arrays.values()):
+        write(f"{part}_{i}.npy", lambda f: np.save(f, array, allow_pickle=False))
+    meta = dict(meta, version=_CACHE_VERSION, arrays=list(arrays.keys()))
+    write(f"{part}.json", lambda f: f.write(json.dumps(meta, default=lambda x: x.item() if hasattr(x, "item") else str(x)).encode()))
 
 class _Suppressor():
     """
@@ -4,9 +4,19 @@ It contains:
 
 - white noise operator "white_noise"
 - AR1 noise operator "ar1_noise"
+- virtual noise ensemble "noise_ensemble"
 
 """
+# Further helper functions (excluded from ReadTheDocs documentation)
+#    - function "_ensemble_array"
+#    - function "_white_noise_member"
+#    - function "_white_noise_block"
+#    - function "_ar1_errors"
+#    - function "_ar1_filter"
+#    - function "_ar1_noise_block"
+#    - function "_ar1_carry"
 from .utilities import *
+from .utilities import _seed_sequence, _member_seed
 import numpy as np
 import xarray as xr
 import pandas as pd
@@ -15,12 +25,22 @@ import pandas as pd
 # White noise operator
 #~~~~~~~~~~~~~~~~~~~~~~~~
 
-def white_noise(sim_data,num_ensemble,mu=0,sigma=1):    
+def white_noise(sim_data,num_ensemble,mu=0,sigma=1,rng=None,virtual=False):    
     """
     Creates white noise by filling an array in shape of the input data with randomly drawn values from a normal (Gaussian) distribution. 
     Adds this white noise to the input data and saves the result as a new (white noise) ensemble member. 
     Multiple new ensemble members can be created. The original input data is kept as the first ensemble member. 
     The result is returned as a xarray DataArray.
+
+    Notes:
+    ------------------------------
+    --> The result array is preallocated and the noise is drawn and added member by member, so at most the noise of one 
+        ensemble member is held in addition to the result. If rng is given, each ensemble member has its own random 
+        stream (see cupsm.noise_ensemble), so the members do not depend on num_ensemble.
+    --> For dask-backed sim_data, the result is a lazy dask array (one chunk per ensemble member and chunk of sim_data). 
+        The noise is generated chunk by chunk when the result is computed, with an independent random stream per chunk.
+        For the same rng, the values differ from those of numpy-backed sim_data.
+    --> With virtual=True, a cupsm.noise_ensemble is returned, which generates the ensemble members on demand.
     
     Parameters:
     ------------------------------
@@ -28,22 +48,43 @@ def white_noise(sim_data,num_ensemble,mu=0,sigma=1):
     :num_ensemble:   integer; number of additional white noise ensemble members to be created.
     :mu:             float; mean of the normal distribution. Default is mu=0.
     :sigma:          float; standard deviation of the normal distribution. Default is sigma=1.
+    :rng:            None, integer, numpy.random.SeedSequence or numpy.random.Generator; seed of the random streams. Default 
+                     is None (the global numpy random state is used, e.g. as set by numpy.random.seed()).
+    :virtual:        boolean; if True, a virtual noise ensemble (cupsm.noise_ensemble) is returned. Default is False.
 
     """
     # Check if dimension "ensemble_member" already exists in sim data
     if "ensemble_member" in sim_data.coords:
         raise Exception("Trying to create new dimension named 'ensemble member', but dimension 'ensemble member' already exists.")
+    if virtual:
+        return noise_ensemble(sim_data, num_ensemble, noise="white", rng=rng, mu=mu, sigma=sigma)
+    
     # Create new ensemble members
+    if sim_data.chunks is not None:
+        # lazy: noise is generated per chunk
+        import dask.array as da
+        data = da.stack((num_ensemble+1)*[sim_data.data]).rechunk({0: 1})
+        data = da.map_blocks(_white_noise_block, data, mu=mu, sigma=sigma, seed=_seed_sequence(rng), dtype=data.dtype)
+        return _ensemble_array(sim_data, data)
+    
+    values = sim_data.values
+    data = np.empty((num_ensemble+1,)+values.shape, dtype=values.dtype)
+    data[0] = values
+    if rng is None:
+        # global random state (drawn member by member, in the order of a single draw for all members)
+        for k in range(1, num_ensemble+1):
+            np.add(values, np.random.normal(mu, sigma, size=values.shape), out=data[k], casting="unsafe")
     else:
-        sim_data_wn=xr.concat((num_ensemble+1)*[sim_data],dim=pd.RangeIndex(0,num_ensemble+1,1,name="ensemble_member"))
-        for i in range(0,num_ensemble):
-            sample= np.random.normal(mu, sigma, size=sim_data.shape) # create white noise
-            sim_data_wn[i+1]=sim_data_wn[i+1]+sample # add white noise to sim data
-    return sim_data_wn  # return sim data (original as first ensemble member) + new white noise ensemble members
+        # one random stream per ensemble member
+        seed = _seed_sequence(rng)
+        for k in range(1, num_ensemble+1):
+            _white_noise_member(values, mu, sigma, np.random.default_rng(_member_seed(seed, k)), out=data[k])
+    return _ensemble_array(sim_data, data)  # return sim data (original as first ensemble member) + new white noise ensemble members
+
 #~~~~~~~~~~~~~~~~~~~~~~~~
 # AR1 noise operator
 #~~~~~~~~~~~~~~~~~~~~~~~~
-def ar1_noise (sim_data,num_ensemble,rho,sigma,quiet=False):
+def ar1_noise (sim_data,num_ensemble,rho,sigma,quiet=False,rng=None,virtual=False):
     """
     Creates first order auto-regressive (AR1) noise 
     following `Y(t)=rho*Y(t-1)+e(t)` with time step `t`,
@@ -63,6 +104,16 @@ def ar1_noise (sim_data,num_ensemble,rho,sigma,quiet=False):
     
     The result is returned as a xarray DataArray.
 
+    Notes:
+    ------------------------------
+    --> The recursion is computed for all ensemble members and grid cells at once along the time axis (with 
+        scipy.signal.lfilter if scipy is installed). If rng is given, each ensemble member has its own random stream 
+        (see cupsm.noise_ensemble), so the members do not depend on num_ensemble.
+    --> For dask-backed sim_data, the result is a lazy dask array. The noise is generated and filtered chunk by chunk, 
+        the state at the end of each time chunk is carried over to the following time chunks. The random stream is 
+        independent per chunk, so for the same rng the values differ from those of numpy-backed sim_data.
+    --> With virtual=True, a cupsm.noise_ensemble is returned, which generates the ensemble members on demand.
+
     Parameters:
     ------------------------------
     :sim_data:      xarray DataArray; input data (e.g. simulation data)
@@ -70,14 +121,15 @@ def ar1_noise (sim_data,num_ensemble,rho,sigma,quiet=False):
     :rho:           float; noise magnitude
     :sigma:         float; standard deviation of Y(t)
     :quiet:         boolean; if True surpresses warning for non-stationary process. Default is False.
+    :rng:           None, integer, numpy.random.SeedSequence or numpy.random.Generator; seed of the random streams. Default 
+                    is None (the global numpy random state is used, e.g. as set by numpy.random.seed()).
+    :virtual:       boolean; if True, a virtual noise ensemble (cupsm.noise_ensemble) is returned. Default is False.
 
     """
     
-    # create new ensemble member dimension
+    # check ensemble member dimension
     if "ensemble_member" in sim_data.coords:
         raise Exception("Trying to create new dimension named 'ensemble member', but dimension 'ensemble member' already exists.")
-    else:
-        sim_data_ar1=xr.concat((num_ensemble+1)*[sim_data],dim=pd.RangeIndex(0,num_ensemble+1,1,name="ensemble_member"))
     
     # parameters of AR1 process    
     if abs(rho) >= 1:
@@ -88,14 +140,266 @@ def ar1_noise (sim_data,num_ensemble,rho,sigma,quiet=False):
     n=int(len(sim_data.time))
     if n<1:
         raise ValueError('The number of (time) steps must be at least one.')
+    if virtual:
+        return noise_ensemble(sim_data, num_ensemble, noise="ar1", rng=rng, rho=rho, sigma=sigma)
     # Generate AR1 noise
     s = sigma * np.sqrt(1 - rho**2)
-    for i in range(0,num_ensemble):
-        e = sim_data.copy(data=np.random.normal(0, s, size=sim_data.shape))
-        e[dict(time=0)] = np.random.rand(*e[dict(time=0)].shape)
-        for t in range(1, n):
-            e[dict(time=t)] += rho * e[dict(time= t - 1)]
+    axis = sim_data.dims.index("time")+1 # time axis of the ensemble
+    
+    if sim_data.chunks is not None:
+        # lazy: noise is generated and filtered per chunk, the state at the end of each time chunk is carried over
+        import dask.array as da
+        chunks = ((1,)*num_ensemble,) + sim_data.data.chunks
+        seed = _seed_sequence(rng)
+        # last values of the chunk-wise filtered noise (starting from zero), recomputed from the seed of each chunk
+        lasts = da.map_blocks(_ar1_noise_block, rho=rho, s=s, axis=axis, seed=seed, lengths=chunks[axis], 
+                              chunks=tuple((1,)*len(c) if i == axis else c for i,c in enumerate(chunks)), dtype=float)
+        carry = _ar1_carry(lasts, rho, chunks[axis], axis)
+        noise = da.map_blocks(_ar1_noise_block, carry, rho=rho, s=s, axis=axis, seed=seed, chunks=chunks, dtype=float)
         # add generated AR1 noise to sim_data
-        sim_data_ar1[i+1]=sim_data_ar1[i+1]+e
+        data = sim_data.data[None]
+        data = da.concatenate([data, (data + noise).astype(data.dtype)], axis=0)
+        return _ensemble_array(sim_data, data)
+
+    values = sim_data.values
+    noise = np.empty((num_ensemble,)+values.shape)
+    if rng is None:
+        # global random state
+        first = (slice(None),)*(axis-1) + (0,) # time step 0 of an ensemble member
+        for i in range(0,num_ensemble):
+            noise[i] = np.random.normal(0, s, size=values.shape)
+            noise[i][first] = np.random.rand(*noise[i][first].shape)
+    else:
+        # one random stream per ensemble member
+        seed = _seed_sequence(rng)
+        for k in range(1, num_ensemble+1):
+            _ar1_errors(s, axis-1, np.random.default_rng(_member_seed(seed, k)), out=noise[k-1])
+    noise = _ar1_filter(noise, rho, axis)
+    
+    # add generated AR1 noise to sim_data
+    data = np.empty((num_ensemble+1,)+values.shape, dtype=values.dtype)
+    data[0] = values
+    data[1:] = values + noise
+    return _ensemble_array(sim_data, data)
+
+#~~~~~~~~~~~~~~~~~~~~~~~~
+# Virtual noise ensemble
+#~~~~~~~~~~~~~~~~~~~~~~~~
+class noise_ensemble:
+    """
+    Virtual noise ensemble: stores the input data and the seed of the random streams and generates the ensemble members 
+    on demand, instead of keeping all (num_ensemble+1) members in memory. Ensemble member 0 is the input data, member k 
+    is the input data plus white or AR1 noise from the k-th random stream spawned from the seed 
+    (numpy.random.SeedSequence.spawn). The ensemble members are the same as those of cupsm.white_noise() or 
+    cupsm.ar1_noise() with the same seed (for numpy-backed sim_data).
+
+    The object can be passed to cupsm.time2chron() instead of a noise ensemble DataArray. Only the ensemble members which 
+    are paired with the age ensemble members are generated there. Usually, the object is created with 
+    cupsm.white_noise(..., virtual=True) or cupsm.ar1_noise(..., virtual=True).
+
+    Attributes:
+    ------------------------------------
+    - attrs:            attributes of the input data
+    - ensemble_member:  numbers of the ensemble members (0 to num_ensemble)
+    - name:             name of the input data
+    - noise:            type of noise, "white" or "ar1"
+    - parameters:       noise parameters (mu and sigma, or rho and sigma)
+    - seed:             numpy.random.SeedSequence of the random streams
+    - sim_data:         the input data
+
+    Methods:
+    ------------------------------------
+    - member:           returns ensemble member k as xarray DataArray
+    - sel:              returns ensemble member k as xarray DataArray (like DataArray.sel(ensemble_member=k))
+    - to_dataarray:     returns all ensemble members as xarray DataArray
+
+    Parameters:
+    ------------------------------------
+    :sim_data:      xarray DataArray; input data (e.g. simulation data). Dask-backed data is loaded into memory.
+    :num_ensemble:  integer; number of noise ensemble members
+    :noise:         string; "white" or "ar1". Default is "white".
+    :rng:           None, integer, numpy.random.SeedSequence or numpy.random.Generator; seed of the random streams. Default 
+                    is None (the seed is drawn from the global numpy random state).
+    :parameters:    noise parameters: mu and sigma for white noise (defaults 0 and 1), rho and sigma for AR1 noise
+    """
+    def __init__(self, sim_data, num_ensemble, noise="white", rng=None, **parameters):
+        if "ensemble_member" in sim_data.coords:
+            raise Exception("Trying to create new dimension named 'ensemble member', but dimension 'ensemble member' already exists.")
+        if noise == "white":
+            self.parameters = {"mu": parameters.get("mu", 0), "sigma": parameters.get("sigma", 1)}
+        elif noise == "ar1":
+            self.parameters = {"rho": parameters["rho"], "sigma": parameters["sigma"]}
+        else:
+            raise ValueError("The keyword parameter noise must be either 'white' or 'ar1'.")
+        self.noise = noise
+        """ Type of noise, "white" or "ar1" """
+        self.sim_data = sim_data.compute() if sim_data.chunks is not None else sim_data
+        """ The input data """
+        self.seed = _seed_sequence(rng)
+        """ numpy.random.SeedSequence of the random streams """
+        self.ensemble_member = np.arange(num_ensemble+1)
+        """ Numbers of the ensemble members """
+        self.name = sim_data.name
+        self.attrs = sim_data.attrs
+
+    def __len__(self):
+        return len(self.ensemble_member)
+
+    def __repr__(self):
+        return (f"<cupsm.noise_ensemble: {self.noise} noise {self.parameters}, {len(self)} ensemble members of "
+                f"'{self.name}' {dict(self.sim_data.sizes)}>")
+
+    def member(self, k):
+        """
+        Returns ensemble member k (0: input data) as xarray DataArray with the scalar coordinate "ensemble_member".
+
+        Parameters:
+        ---------------------------------
+        :k:             integer; number of the ensemble member
+        """
+        k = int(k)
+        if k < 0 or k >= len(self):
+            raise IndexError(f"The ensemble member {k} is not available (0 to {len(self)-1}).")
+        values = self.sim_data.values
+        if k == 0:
+            data = values
+        elif self.noise == "white":
+            data = np.empty(values.shape, dtype=values.dtype)
+            _white_noise_member(values, self.parameters["mu"], self.parameters["sigma"], 
+                                np.random.default_rng(_member_seed(self.seed, k)), out=data)
+        else:
+            rho, sigma = self.parameters["rho"], self.parameters["sigma"]
+            axis = self.sim_data.dims.index("time")
+            errors = _ar1_errors(sigma * np.sqrt(1 - rho**2), axis, np.random.default_rng(_member_seed(self.seed, k)), 
+                                 out=np.empty(values.shape))
+            data = (values + _ar1_filter(errors, rho, axis)).astype(values.dtype, copy=False)
+        return self.sim_data.copy(data=data).assign_coords(ensemble_member=k)
+
+    def sel(self, ensemble_member):
+        """
+        Returns ensemble member k as xarray DataArray, like DataArray.sel(ensemble_member=k).
+        """
+        return self.member(ensemble_member)
+
+    def to_dataarray(self):
+        """
+        Returns all ensemble members as xarray DataArray with the dimension "ensemble_member" (as returned by 
+        cupsm.white_noise() or cupsm.ar1_noise()).
+        """
+        if self.noise == "white":
+            return white_noise(self.sim_data, len(self)-1, rng=self.seed, **self.parameters)
+        return ar1_noise(self.sim_data, len(self)-1, quiet=True, rng=self.seed, **self.parameters)
 
-    return sim_data_ar1
+#~~~~~~~~~~~~~~~~~~~~~~~~
+# Helper functions
+#~~~~~~~~~~~~~~~~~~~~~~~~
+def _ensemble_array(sim_data, data):
+    """
+    Returns data with the leading dimension "ensemble_member" (numbered from 0) as xarray DataArray with the coordinates, 
+    name and attributes of sim_data. Helper function for the noise operators.
+
+    Parameters:
+    ------------------------------
+    :sim_data:      xarray DataArray; input data of the noise operator
+    :data:          numpy or dask array; ensemble data of shape (ensemble_member, *sim_data.shape)
+    """
+    coords = {name: coord for name, coord in sim_data.coords.items()}
+    coords["ensemble_member"] = pd.RangeIndex(0, data.shape[0], 1, name="ensemble_member")
+    return xr.DataArray(data, dims=("ensemble_member",)+sim_data.dims, coords=coords, name=sim_data.name, attrs=sim_data.attrs)
+
+def _white_noise_member(values, mu, sigma, rng, out):
+    """
+    Writes values plus white noise drawn with the random number generator rng into out. Helper function for the noise 
+    operators.
+    """
+    if out.dtype in [np.float32, np.float64]:
+        # draw directly into the result array
+        rng.standard_normal(out=out, dtype=out.dtype)
+        out *= sigma
+        out += values + mu
+    else:
+        out[...] = values + rng.normal(mu, sigma, size=values.shape)
+    return out
+
+def _white_noise_block(block, mu, sigma, seed, block_info=None):
+    """
+    Adds white noise to a chunk of the ensemble (the first ensemble member is kept). The random stream is spawned from 
+    seed by the chunk location. Helper function for cupsm.white_noise().
+    """
+    location = block_info[None]["chunk-location"]
+    if location[0] == 0:
+        return block
+    rng = np.random.default_rng(np.random.SeedSequence(seed.entropy, spawn_key=seed.spawn_key+tuple(location)))
+    return (block + rng.normal(mu, sigma, size=block.shape)).astype(block.dtype, copy=False)
+
+def _ar1_errors(s, axis, rng, out):
+    """
+    Writes the error terms e(t) of the AR1 process (normal distribution with standard deviation s, uniform distribution 
+    over [0,1) at the first time step) drawn with the random number generator rng into out. Helper function for the noise 
+    operators.
+    """
+    rng.standard_normal(out=out)
+    out *= s
+    first = (slice(None),)*axis + (0,)
+    out[first] = rng.random(size=out[first].shape)
+    return out
+
+def _ar1_filter(noise, rho, axis):
+    """
+    Computes the AR1 recursion `Y(t)=rho*Y(t-1)+e(t)` along the given axis, starting from Y(0)=e(0). Uses 
+    scipy.signal.lfilter if scipy is installed. Helper function for cupsm.ar1_noise().
+
+    Parameters:
+    ------------------------------
+    :noise:         numpy.ndarray; error terms e(t)
+    :rho:           float; noise magnitude
+    :axis:          integer; time axis
+    """
+    try:
+        from scipy.signal import lfilter
+    except ImportError:
+        noise = np.moveaxis(noise, axis, 0)
+        for t in range(1, noise.shape[0]):
+            noise[t] += rho * noise[t-1]
+        return np.moveaxis(noise, 0, axis)
+    return lfilter([1.0], [1.0, -rho], noise, axis=axis)
+
+def _ar1_noise_block(carry=None, rho=0, s=1, axis=0, seed=None, lengths=None, block_info=None):
+    """
+    Generates AR1 noise for a chunk of the ensemble, starting from zero (or from uniform random values at the first time 
+    step). The random stream is spawned from seed by the chunk location. The decaying state carry (carried over from the 
+    previous time chunks) is added, if given. If the lengths of the time chunks are given, only the last time step is 
+    returned. Helper function for 
+    cupsm.ar1_noise().
+    """
+    info = block_info[None]
+    rng = np.random.default_rng(np.random.SeedSequence(seed.entropy, spawn_key=seed.spawn_key+tuple(info["chunk-location"])))
+    shape = list(info["chunk-shape"])
+    if lengths is not None:
+        # the time chunks of the output have length 1
+        shape[axis] = lengths[info["chunk-location"][axis]]
+    noise = rng.normal(0, s, size=shape)
+    if info["chunk-location"][axis] == 0:
+        first = (slice(None),)*axis + (0,)
+        noise[first] = rng.random(size=noise[first].shape)
+    noise = _ar1_filter(noise, rho, axis)
+    if lengths is not None:
+        return noise.take([-1], axis=axis)
+    if carry is not None:
+        decay = [1]*noise.ndim
+        decay[axis] = -1
+        noise += rho**np.arange(1, noise.shape[axis]+1).reshape(decay) * carry
+    return noise
+
+def _ar1_carry(lasts, rho, lengths, axis):
+    """
+    Returns the (lazy) state Y carried into each time chunk, given the last values of the chunk-wise filtered noise 
+    (starting from zero) and the lengths of the time chunks. The carry into a time chunk only depends on the carry into 
+    and the last values of the previous time chunk. Helper function for cupsm.ar1_noise().
+    """
+    import dask.array as da
+    index = lambda k: (slice(None),)*axis + (slice(k, k+1),)
+    carry = [da.zeros_like(lasts[index(0)])]
+    for k in range(1, len(lengths)):
+        carry.append(lasts[index(k-1)] + rho**lengths[k-1] * carry[-1])
+    return da.concatenate(carry, axis=axis)
@@ -0,0 +1,54 @@
+"""
+Tests of the record objects: loaded data can be changed in place without changing the record.
+"""
+import numpy as np
+import pytest
+
+import cupsm
+
+
+def _lipd_dict(n_depth=20, n_ens=5, seed=0):
+    """ Minimal LiPD dictionary as read by cupsm.read_lpd(). """
+    rng = np.random.default_rng(seed)
+    depth = np.sort(rng.uniform(0, 5, n_depth))
+    age = np.sort(rng.uniform(0, 20, n_depth))
+    paleo = {"depth_merged": {"number": 1, "units": "m", "variableName": "depth_merged", "values": depth},
+             "age": {"number": 2, "units": "ka", "variableName": "age", "values": age},
+             "surface.temp": {"number": 3, "units": "degC", "variableName": "surface.temp", "habitatSeason": "annual",
+                              "values": rng.normal(15, 2, n_depth)}}
+    chron = {"depth": {"number": 1, "units": "m", "variableName": "depth", "values": depth}}
+    for i in range(n_ens):
+        chron[f"age-{i+2}-ens"] = {"number": i+2, "units": "ka", "variableName": f"age-{i+2}-ens", "ensembleName": "age",
+                                   "isEnsemble": True, "values": list(np.sort(age + rng.normal(0, 0.2, n_depth)))}
+    return {"archiveType": "marine sediment", "dataSetName": "Site000", "lipdVersion": 1.3,
+            "geo": {"geometry": {"coordinates": [10.0, 40.0, -3000.0], "type": "Point"}, "siteName": "Site000"},
+            "paleoData": {"paleo0": {"measurementTable": {"paleo0measurement0": {"columns": paleo}}}},
+            "chronData": {"chron0": {"model": {"chron0model0": {"ensembleTable": {"chron0model0ensemble0": {"columns": chron}}}}}}}
+
+
+def _records():
+    memoized = cupsm.lipd2object(_lipd_dict())
+    memoized.memo_max_bytes = 2**20
+    return {"lipd2object": cupsm.lipd2object(_lipd_dict()), "lipd2object (memoized)": memoized, 
+            "compact_site": cupsm.compact_site(_lipd_dict())}
+
+
+@pytest.mark.parametrize("name", ["lipd2object", "lipd2object (memoized)", "compact_site"])
+def test_chron_data_changed_in_place(name):
+    record = _records()[name]
+    expected = record.load_chron_data().copy(deep=True)
+    chron = record.load_chron_data()
+    chron.values[:] = -1
+    chron *= 2
+    assert record.load_chron_data().identical(expected)
+
+
+@pytest.mark.parametrize("name", ["lipd2object", "lipd2object (memoized)", "compact_site"])
+def test_paleo_data_changed_in_place(name):
+    record = _records()[name]
+    expected = record.load_paleo_data("surface.temp", quiet=True).copy(deep=True)
+    paleo = record.load_paleo_data("surface.temp", quiet=True)
+    for variable in paleo.data_vars.values():
+        variable.values[...] = -1
+    reloaded = record.load_paleo_data("surface.temp", quiet=True)
+    assert reloaded.identical(expected)
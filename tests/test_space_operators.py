@@ -0,0 +1,87 @@
+"""
+Regression tests of the space operators against a naive (per grid cell) reference of the distance weighting.
+"""
+import numpy as np
+import xarray as xr
+import pytest
+
+import cupsm
+
+# mean earth radius in meters, as used by geopy.distance.great_circle
+EARTH_RADIUS_M = 6371.009e3
+
+
+class Site:
+    """ Minimal site object with the attributes used by the space operators. """
+    def __init__(self, lon, lat):
+        self.coords = [lon, lat, -1000]
+        self.site_name = "test_site"
+
+
+def _field(nt=6, res=2.0, seed=0):
+    rng = np.random.default_rng(seed)
+    lon = np.arange(-179, 180, res)
+    lat = np.arange(-89, 90, res)
+    time = xr.date_range("0001-01-01", periods=nt, freq="MS", calendar="noleap", use_cftime=True)
+    data = rng.normal(size=(nt, len(lat), len(lon))) + 15
+    # grid cells that are nan at a single time step or at all time steps
+    data[2, 65, 95] = np.nan
+    data[:, 66, 96:99] = np.nan
+    return xr.DataArray(data, dims=("time", "lat", "lon"), coords={"time": time, "lat": lat, "lon": lon}, 
+                        name="tos", attrs={"units": "degC"})
+
+
+def _haversine_m(lon, lat, x, y):
+    lon, lat, x, y = map(np.deg2rad, (lon, lat, x, y))
+    a = np.sin((lat - y) / 2)**2 + np.cos(lat) * np.cos(y) * np.sin((lon - x) / 2)**2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+def _reference(field, x, y, method, radius_km):
+    """ Loop over all grid cells, as the operator before vectorization (without the search box). """
+    radius_m = radius_km * 1e3
+    weights = np.full((field.sizes["lat"], field.sizes["lon"]), np.nan)
+    nan_cells = np.isnan(field.values).any(axis=0)
+    for j, cell_lat in enumerate(field.lat.values):
+        for i, cell_lon in enumerate(field.lon.values):
+            if nan_cells[j, i]:
+                continue
+            w_dist = radius_m - _haversine_m(cell_lon, cell_lat, x, y)
+            if w_dist >= 0:
+                weights[j, i] = w_dist
+    if method == "nn":
+        j, i = np.unravel_index(np.nanargmax(weights), weights.shape)
+        return field.isel(lat=j, lon=i).values
+    weights = weights / np.nansum(weights) * np.cos(np.deg2rad(field.lat.values))[:, None]
+    return np.nansum(field.values * weights, axis=(1, 2))
+
+
+@pytest.mark.parametrize("method, radius_km, x, y", [
+    ("dist", 50, 21.0, 41.0),       # point: only the grid cell at the site
+    ("dist", 500, 12.3, 41.7),      # radius: distance weighted mean
+    ("dist", 800, 10.5, -60.2),
+    ("dist", 500, 13.0, 43.0),      # nan grid cells within the radius
+    ("nn", 500, 12.3, 41.7),        # nearest neighbor
+    ("nn", 500, 12.9, 43.1),        # nearest grid cell is nan
+])
+def test_field2site_matches_reference(method, radius_km, x, y):
+    field = _field()
+    site = Site(x, y)
+    result = cupsm.field2site(field, site, method=method, radius_km=radius_km)
+    np.testing.assert_allclose(result.values, _reference(field, x, y, method, radius_km), rtol=1e-12)
+    assert result.attrs == {"lon": x, "lat": y, "units": "degC"}
+
+
+@pytest.mark.parametrize("method", ["dist", "nn"])
+def test_site_weights_match_field2site(method):
+    field = _field()
+    site = Site(12.3, 41.7)
+    weights = cupsm.create_site_weights(field, site, method=method, radius_km=500)
+    xr.testing.assert_allclose(cupsm.field2site(field, site, site_weights=weights),
+                               cupsm.field2site(field, site, method=method, radius_km=500))
+
+
+def test_field2site_without_values():
+    field = _field()
+    with pytest.raises(ValueError):
+        cupsm.field2site(field.where(field.lat < 0), Site(12.3, 41.7), radius_km=300)